@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -36,8 +38,10 @@ ALLOWED_HOSTS.extend(
 
 # Application definition
 
+# API-only processes can skip loading the admin entirely
+ADMIN_ENABLED = bool(int(os.environ.get('ADMIN_ENABLED', 1)))
+
 INSTALLED_APPS = [
-    'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -51,7 +55,12 @@ INSTALLED_APPS = [
     'recipe',
 ]
 
+if ADMIN_ENABLED:
+    INSTALLED_APPS.insert(0, 'django.contrib.admin')
+
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,6 +89,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'app.wsgi.application'
+ASGI_APPLICATION = 'app.asgi.application'
 
 
 # Database
@@ -87,14 +97,47 @@ WSGI_APPLICATION = 'app.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        # seconds to keep a connection open between requests, 0 disables
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        # ping reused connections once per request before using them
+        'CONN_HEALTH_CHECKS': bool(
+            int(os.environ.get('DB_CONN_HEALTH_CHECKS', 1))
+        ),
+        # required behind pgbouncer in transaction pooling mode
+        'DISABLE_SERVER_SIDE_CURSORS': bool(
+            int(os.environ.get('DB_DISABLE_SERVER_SIDE_CURSORS', 0))
+        ),
     }
 }
 
+# Read replicas share the primary's credentials, one alias per host
+REPLICA_DATABASES = []
+for index, replica_host in enumerate(
+    filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')),
+    start=1,
+):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+
+# seconds a user's reads stay on the primary after one of their writes
+REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))
+
+# milliseconds slept before every query to simulate a slow or distant
+# database in load tests, see core.db.latency. Never set in production.
+DB_INJECT_LATENCY_MS = int(os.environ.get('DB_INJECT_LATENCY_MS', 0))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -114,6 +157,38 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing. New hashes use PASSWORD_HASHER, the others still
+# verify existing hashes, which are upgraded on the next login.
+PASSWORD_HASHERS_BY_NAME = {
+    'pbkdf2': 'core.hashers.PBKDF2PasswordHasher',
+    'argon2': 'core.hashers.Argon2PasswordHasher',
+    'bcrypt': 'core.hashers.BCryptSHA256PasswordHasher',
+}
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'pbkdf2')
+if PASSWORD_HASHER not in PASSWORD_HASHERS_BY_NAME:
+    raise ImproperlyConfigured(
+        f'PASSWORD_HASHER must be one of '
+        f'{", ".join(PASSWORD_HASHERS_BY_NAME)}, not {PASSWORD_HASHER!r}'
+    )
+PASSWORD_HASHERS = [PASSWORD_HASHERS_BY_NAME[PASSWORD_HASHER]] + [
+    hasher for name, hasher in PASSWORD_HASHERS_BY_NAME.items()
+    if name != PASSWORD_HASHER
+]
+
+PASSWORD_PBKDF2_ITERATIONS = int(
+    os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 320000)
+)
+PASSWORD_ARGON2_TIME_COST = int(
+    os.environ.get('PASSWORD_ARGON2_TIME_COST', 2)
+)
+PASSWORD_ARGON2_MEMORY_COST = int(
+    os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 102400)
+)
+PASSWORD_ARGON2_PARALLELISM = int(
+    os.environ.get('PASSWORD_ARGON2_PARALLELISM', 8)
+)
+PASSWORD_BCRYPT_ROUNDS = int(os.environ.get('PASSWORD_BCRYPT_ROUNDS', 12))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
@@ -136,7 +211,16 @@ STATIC_URL = '/static/static/'
 MEDIA_URL = '/static/media/'
 
 MEDIA_ROOT = '/vol/web/media'
-STATIC_ROOT = '/vol/web/static'
+STATIC_ROOT = os.environ.get('STATIC_ROOT', '/vol/web/static')
+
+# internal nginx location media files are handed off to, see core.media
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get(
+    'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/'
+)
+# uploaded file names are unique, clients can keep them for a long time
+MEDIA_CACHE_SECONDS = int(
+    os.environ.get('MEDIA_CACHE_SECONDS', 365 * 24 * 60 * 60)
+)
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
@@ -147,8 +231,116 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.UserRateThrottle',
+        'core.throttling.IPRateThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'user': os.environ.get('THROTTLE_RATE_USER', '600/min'),
+        'ip': os.environ.get('THROTTLE_RATE_IP', '1200/min'),
+        'auth': os.environ.get('THROTTLE_RATE_AUTH', '20/min'),
+    },
+    # proxies in front of the app, used to find the client IP. Left at 0
+    # behind nginx every client shares nginx's address, deploy sets 1
+    'NUM_PROXIES': int(os.environ.get('THROTTLE_NUM_PROXIES', 0)),
+}
+
+# most recipes returned by one recipes/batch/ request
+RECIPE_BATCH_MAX_IDS = int(os.environ.get('RECIPE_BATCH_MAX_IDS', 100))
+
+# seconds recipes/facets/ results are cached, writes invalidate sooner
+RECIPE_FACETS_CACHE_SECONDS = int(
+    os.environ.get('RECIPE_FACETS_CACHE_SECONDS', 300)
+)
+
+# most used tags and ingredients listed by user/me/stats/
+USER_STATS_TOP = int(os.environ.get('USER_STATS_TOP', 5))
+
+# seconds an Idempotency-Key and its stored response are kept
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+# seconds before a key whose request never finished can be reused
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', 60))
+
+# most sub-requests in one api/batch/ request and threads serving them
+BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', 20))
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', 4))
+
+# seconds an unused auth token stays valid
+TOKEN_TTL = int(os.environ.get('TOKEN_TTL', 14 * 24 * 60 * 60))
+# minimum seconds between sliding a used token's expiry forward
+TOKEN_REFRESH_INTERVAL = int(os.environ.get('TOKEN_REFRESH_INTERVAL', 3600))
+
+# Throttle counters must be shared by all workers to be accurate. The
+# local memory default counts per process, use redis or memcached in
+# production: their add/incr are atomic. The file based cache is no
+# substitute, its incr is an unlocked read then write and it deletes
+# entries at random once full, resetting counters.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'throttle': {
+        'BACKEND': os.environ.get(
+            'THROTTLE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('THROTTLE_CACHE_LOCATION', 'throttle'),
+    },
+    # computed recipe data such as facet counts, invalidated on writes so
+    # it must be shared by all workers too
+    'recipes': {
+        'BACKEND': os.environ.get(
+            'RECIPE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('RECIPE_CACHE_LOCATION', 'recipes'),
+    },
+    # users pinned to the primary after a write (core.db.routers), every
+    # worker must see the pin or reads go to a lagging replica
+    'routing': {
+        'BACKEND': os.environ.get(
+            'ROUTING_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('ROUTING_CACHE_LOCATION', 'routing'),
+    },
 }
 
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
-}
\ No newline at end of file
+}
+
+# seconds a readiness result is served before it is refreshed
+READINESS_CACHE_SECONDS = float(os.environ.get('READINESS_CACHE_SECONDS', 5))
+
+# bearer token required to scrape api/metrics/, unset it is only served
+# with DEBUG on
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Request profiling, see core.middleware.ProfilingMiddleware
+
+# fraction of requests profiled at random, 0 disables sampling
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+# allow clients to request profiling with an "X-Profile: 1" header
+PROFILING_HEADER_ENABLED = bool(
+    int(os.environ.get('PROFILING_HEADER_ENABLED', 0))
+)
+# directory for cProfile dumps of profiled requests, unset disables
+PROFILING_DUMP_DIR = os.environ.get('PROFILING_DUMP_DIR')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # count queries on connections opened from now on, in any thread
+        from core import middleware  # noqa: F401
+        # slow queries down on purpose when DB_INJECT_LATENCY_MS is set
+        from core.db import latency  # noqa: F401
@@ -0,0 +1,63 @@
+"""
+Expiring, sliding token authentication.
+
+A token expires once it has been idle for TOKEN_TTL seconds. Using a
+token pushes its expiry forward, but at most once per
+TOKEN_REFRESH_INTERVAL, so authentication stays a single primary key
+lookup and only occasionally writes. The token's ``created`` column
+holds the time of the last refresh.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def token_expired(token, now=None):
+    now = now or timezone.now()
+    return token.created <= now - timedelta(seconds=settings.TOKEN_TTL)
+
+
+def refresh_token(token, now=None):
+    '''Slide the expiry forward if the last refresh is old enough'''
+    now = now or timezone.now()
+    interval = timedelta(seconds=settings.TOKEN_REFRESH_INTERVAL)
+    if token.created <= now - interval:
+        Token.objects.filter(pk=token.pk).update(created=now)
+        token.created = now
+
+
+def issue_token(user):
+    '''Return the user's token, replacing it when expired'''
+    token, created = Token.objects.get_or_create(user=user)
+    if not created:
+        if token_expired(token):
+            # rotate in place, delete and create again would let a
+            # concurrent login fail on the user's unique token. When
+            # another login rotated it first this updates nothing and
+            # both return its token.
+            Token.objects.filter(pk=token.pk).update(
+                key=Token.generate_key(),
+                created=timezone.now(),
+            )
+            token = Token.objects.get(user=user)
+        else:
+            refresh_token(token)
+
+    return token
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        user, token = super().authenticate_credentials(key)
+        now = timezone.now()
+        if token_expired(token, now):
+            raise exceptions.AuthenticationFailed(_('Token has expired.'))
+        refresh_token(token, now)
+
+        return user, token
@@ -0,0 +1,204 @@
+"""
+Multiplexed batch requests.
+
+A client sends several API requests in one POST to /api/batch/. The
+batch is authenticated once and every sub-request is dispatched straight
+to the view it resolves to, skipping the middleware and authentication
+of a separate HTTP request. Runs of read-only sub-requests can be served
+concurrently by a thread pool.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import io
+import json
+import queue
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from drf_spectacular.utils import extend_schema
+from rest_framework import serializers
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.authentication import ExpiringTokenAuthentication
+
+
+# views a batch may call, by namespace or full view name
+ALLOWED_NAMESPACES = {'recipe'}
+ALLOWED_VIEWS = {'user:me'}
+METHODS = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE']
+# describe the batch itself rather than any one sub-request
+SKIPPED_META = {
+    'CONTENT_TYPE',
+    'CONTENT_LENGTH',
+    'QUERY_STRING',
+    'HTTP_IDEMPOTENCY_KEY',
+    'HTTP_IF_MATCH',
+}
+
+
+class SubRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=METHODS, default='GET')
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False)
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+    concurrent = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                f'At most {settings.BATCH_MAX_REQUESTS} requests.'
+            )
+        return value
+
+
+class SubResponseSerializer(serializers.Serializer):
+    status = serializers.IntegerField()
+    body = serializers.JSONField(allow_null=True)
+
+
+class BatchResponseSerializer(serializers.Serializer):
+    responses = SubResponseSerializer(many=True)
+
+
+def _resolve(path):
+    '''Return the resolver match for path if a batch may call it'''
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return None
+    if (
+        match.namespace in ALLOWED_NAMESPACES
+        or match.view_name in ALLOWED_VIEWS
+    ):
+        return match
+    return None
+
+
+def build_request(request, method, path, body=None):
+    '''Copy of the batch request for a single sub-request'''
+    url = urlsplit(path)
+    content = b'' if body is None else json.dumps(body).encode()
+    sub = HttpRequest()
+    sub.method = method
+    sub.path = sub.path_info = url.path
+    sub.META = {
+        key: value for key, value in request.META.items()
+        if key not in SKIPPED_META
+    }
+    sub.META.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(content)),
+    })
+    sub.GET = QueryDict(url.query)
+    sub._stream = io.BytesIO(content)
+    sub._read_started = False
+    # already authenticated, DRF uses these instead of the authenticators
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+
+    return sub
+
+
+def dispatch(request, method, path, body=None):
+    '''Run one sub-request and return its {status, body}'''
+    match = _resolve(urlsplit(path).path)
+    if match is None:
+        return {'status': 404, 'body': {'detail': 'Not found.'}}
+
+    sub = build_request(request, method, path, body)
+    sub.resolver_match = match
+    response = match.func(sub, *match.args, **match.kwargs)
+
+    return {
+        'status': response.status_code,
+        'body': getattr(response, 'data', None),
+    }
+
+
+def _serve_reads(request, pending, responses):
+    '''Dispatch queued reads from a pool thread until none are left
+
+    The thread then closes the connections it opened, once rather than
+    after every sub-request, which would reconnect for each of them.
+    '''
+    try:
+        while True:
+            try:
+                index, sub = pending.get_nowait()
+            except queue.Empty:
+                return
+            responses[index] = dispatch(request, **sub)
+    finally:
+        connections.close_all()
+
+
+def run_batch(request, sub_requests, concurrent=False):
+    '''Dispatch sub_requests in order, returning their responses
+
+    With concurrent set, consecutive read-only sub-requests run in a
+    thread pool. Writes always run alone, so the ones after a write see
+    its result.
+    '''
+    responses = []
+    reads = []
+
+    def flush_reads():
+        if len(reads) > 1:
+            workers = min(len(reads), settings.BATCH_MAX_WORKERS)
+            pending = queue.SimpleQueue()
+            for item in enumerate(reads):
+                pending.put(item)
+            results = [None] * len(reads)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(_serve_reads, request, pending, results)
+                    for _ in range(workers)
+                ]
+            for future in futures:
+                # re-raise errors from the pool threads
+                future.result()
+            responses.extend(results)
+        elif reads:
+            responses.append(dispatch(request, **reads[0]))
+        reads.clear()
+
+    for sub in sub_requests:
+        if concurrent and sub['method'] in SAFE_METHODS:
+            reads.append(sub)
+            continue
+        flush_reads()
+        responses.append(dispatch(request, **sub))
+    flush_reads()
+
+    return responses
+
+
+class BatchView(APIView):
+    '''Run several API requests with a single round trip'''
+    authentication_classes = [ExpiringTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        request=BatchRequestSerializer,
+        responses=BatchResponseSerializer,
+    )
+    def post(self, request):
+        serializer = BatchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        responses = run_batch(
+            request,
+            serializer.validated_data['requests'],
+            concurrent=serializer.validated_data['concurrent'],
+        )
+
+        return Response({'responses': responses})
@@ -0,0 +1,67 @@
+"""
+PostgreSQL backend with connection health checks and acquisition timing.
+
+Persistent connections (CONN_MAX_AGE) can be dropped by the server or a
+pooler between requests. With CONN_HEALTH_CHECKS enabled a reused
+connection is pinged once per request before its first query and is
+transparently replaced when it no longer works.
+"""
+import logging
+import time
+
+from django.db.backends.postgresql import base
+from django.utils.asyncio import async_unsafe
+
+from core import metrics
+from core.db.stats import connection_stats
+
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_enabled = self.settings_dict.get(
+            'CONN_HEALTH_CHECKS',
+            False,
+        )
+        self.health_check_done = False
+
+    def get_new_connection(self, conn_params):
+        start = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        elapsed = time.perf_counter() - start
+        connection_stats.record_connect(elapsed)
+        metrics.DB_CONNECT_LATENCY.observe(elapsed)
+        logger.debug('Opened database connection in %.1fms', elapsed * 1000)
+
+        return connection
+
+    def connect(self):
+        super().connect()
+        # a brand new connection doesn't need to be checked
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        # called at request start/finish, check again on next use
+        self.health_check_done = False
+
+    @async_unsafe
+    def ensure_connection(self):
+        if (
+            self.connection is not None
+            and self.health_check_enabled
+            and not self.health_check_done
+            and not self.in_atomic_block
+        ):
+            if not self.is_usable():
+                connection_stats.record_health_check_failure()
+                metrics.DB_HEALTH_CHECK_FAILURES.inc()
+                logger.warning('Dropping unusable database connection')
+                self.close()
+            self.health_check_done = True
+
+        super().ensure_connection()
@@ -0,0 +1,30 @@
+"""
+Artificial database latency for load tests.
+
+With DB_INJECT_LATENCY_MS set, every query sleeps that long before it is
+sent. The sleep releases the GIL like waiting on a real database round
+trip does, so it shows how a deployment behaves when requests spend most
+of their time waiting on the database, without needing a slow database.
+The wrapper is installed on each connection as it is opened, nothing is
+added when the setting is 0.
+"""
+import time
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def delay_query(execute, sql, params, many, context):
+    '''Execute wrapper sleeping DB_INJECT_LATENCY_MS before the query'''
+    time.sleep(settings.DB_INJECT_LATENCY_MS / 1000)
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def _install_delay(sender, connection, **kwargs):
+    if not settings.DB_INJECT_LATENCY_MS:
+        return
+    # fired again when a closed connection reconnects
+    if delay_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(delay_query)
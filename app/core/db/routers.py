@@ -0,0 +1,65 @@
+"""
+Database router sending opted-in reads to replicas.
+
+Reads only go to a replica inside ``replica_reads()``; everything else,
+including all writes, uses the primary. Views opt in per request via
+``recipe.views.ReplicaReadMixin``.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+use_replica = ContextVar('use_replica', default=False)
+
+
+@contextmanager
+def replica_reads():
+    token = use_replica.set(True)
+    try:
+        yield
+    finally:
+        use_replica.reset(token)
+
+
+def _cache():
+    # shared by all workers, the next request may land on another one
+    return caches['routing']
+
+
+def _sticky_key(user):
+    return f'replica-sticky:{user.pk}'
+
+
+def pin_to_primary(user):
+    '''Keep reads for user on the primary while replicas catch up'''
+    timeout = settings.REPLICA_STICKY_SECONDS
+    if user.is_authenticated and timeout:
+        _cache().set(_sticky_key(user), True, timeout)
+
+
+def is_pinned_to_primary(user):
+    return user.is_authenticated and bool(_cache().get(_sticky_key(user)))
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_DATABASES
+        if replicas and use_replica.get():
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.REPLICA_DATABASES:
+            return False
+        return None
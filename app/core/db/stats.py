@@ -0,0 +1,41 @@
+"""
+Process-wide counters for database connection handling.
+"""
+import threading
+
+
+class ConnectionStats:
+    '''Thread-safe counters for new connections and health checks'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connects = 0
+            self.connect_seconds_total = 0.0
+            self.connect_seconds_max = 0.0
+            self.health_check_failures = 0
+
+    def record_connect(self, seconds):
+        with self._lock:
+            self.connects += 1
+            self.connect_seconds_total += seconds
+            self.connect_seconds_max = max(self.connect_seconds_max, seconds)
+
+    def record_health_check_failure(self):
+        with self._lock:
+            self.health_check_failures += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'connects': self.connects,
+                'connect_seconds_total': self.connect_seconds_total,
+                'connect_seconds_max': self.connect_seconds_max,
+                'health_check_failures': self.health_check_failures,
+            }
+
+
+connection_stats = ConnectionStats()
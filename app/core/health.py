@@ -0,0 +1,119 @@
+"""
+Readiness checks for load balancer probes.
+
+Checks touch the database and filesystem, so results are cached and,
+once the first result exists, refreshed in a background thread. A probe
+never waits on a slow or unreachable database.
+"""
+import logging
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+
+logger = logging.getLogger(__name__)
+
+
+def has_pending_migrations(conn=connection):
+    executor = MigrationExecutor(conn)
+    targets = executor.loader.graph.leaf_nodes()
+    return bool(executor.migration_plan(targets))
+
+
+def check_database():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def check_migrations():
+    if has_pending_migrations():
+        raise RuntimeError('Unapplied migrations')
+
+
+def check_media():
+    with tempfile.NamedTemporaryFile(dir=settings.MEDIA_ROOT):
+        pass
+
+
+CHECKS = {
+    'database': check_database,
+    'migrations': check_migrations,
+    'media': check_media,
+}
+
+
+def run_checks():
+    results = {}
+    for name, check in CHECKS.items():
+        try:
+            check()
+            results[name] = 'ok'
+        except Exception:
+            # the endpoint is public, errors can name hosts and paths
+            logger.exception('Readiness check %s failed', name)
+            results[name] = 'failed'
+
+    return {
+        'ready': all(result == 'ok' for result in results.values()),
+        'checks': results,
+    }
+
+
+class ReadinessProbe:
+    '''Cached readiness result refreshed in the background'''
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._result = None
+        self._checked_at = 0.0
+        self._refreshing = False
+
+    def _refresh(self):
+        result = run_checks()
+        with self._lock:
+            self._result = result
+            self._checked_at = time.monotonic()
+            self._refreshing = False
+
+    def _refresh_in_background(self):
+        try:
+            self._refresh()
+        finally:
+            with self._lock:
+                self._refreshing = False
+            # the refresh thread owns its connection, don't leak it
+            connection.close()
+
+    def get(self):
+        if self._result is None:
+            self._refresh()
+            return self._result
+
+        with self._lock:
+            stale = time.monotonic() - self._checked_at >= self.ttl
+            start = stale and not self._refreshing
+            if start:
+                self._refreshing = True
+        if start:
+            threading.Thread(
+                target=self._refresh_in_background,
+                daemon=True,
+            ).start()
+
+        return self._result
+
+
+_probe = None
+
+
+def get_probe():
+    global _probe
+    if _probe is None:
+        _probe = ReadinessProbe(settings.READINESS_CACHE_SECONDS)
+    return _probe
@@ -0,0 +1,143 @@
+"""
+Idempotency-Key support for non-idempotent API views.
+
+The first request with a key claims it and stores its response. Retries
+with the same key get the stored response back without the view running
+again, so a client retrying after a timeout can't create duplicates. A
+key reused for a different request is rejected with 422 and a retry
+arriving while the first request is still running with 409. Keys are
+kept for IDEMPOTENCY_KEY_TTL seconds, see purge_idempotency_keys.
+"""
+from datetime import timedelta
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.models import IdempotencyKey
+
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+
+def request_fingerprint(request):
+    '''Hash of the method, path and parsed body of request'''
+    digest = hashlib.sha256(f'{request.method} {request.path}'.encode())
+    data = request.data
+    if hasattr(data, 'lists'):
+        for name, values in sorted(data.lists()):
+            digest.update(name.encode())
+            for value in values:
+                if isinstance(value, UploadedFile):
+                    # chunks() starts from the beginning, the view can
+                    # still read the whole file afterwards
+                    for chunk in value.chunks():
+                        digest.update(chunk)
+                else:
+                    digest.update(str(value).encode())
+    else:
+        digest.update(json.dumps(data, sort_keys=True, default=str).encode())
+
+    return digest.hexdigest()
+
+
+def _error(detail, status_code):
+    return Response({'detail': detail}, status=status_code)
+
+
+def _claim(user, key, fingerprint):
+    '''Return (record, claimed), claimed when this request should run
+
+    record is None when the key kept changing hands while being claimed.
+    '''
+    now = timezone.now()
+    expired = now - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    stale = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT)
+    records = IdempotencyKey.objects.filter(user=user, key=key)
+    records.filter(created_at__lte=expired).delete()
+    # a second attempt when the record that blocked the first was deleted
+    # before it could be read, by a failed request or the purge
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(
+                    user=user,
+                    key=key,
+                    fingerprint=fingerprint,
+                    created_at=now,
+                ), True
+        except IntegrityError:
+            pass
+        try:
+            record = records.get()
+        except IdempotencyKey.DoesNotExist:
+            continue
+
+        # take over a key left running by a request that never finished
+        if record.fingerprint == fingerprint and records.filter(
+            status_code__isnull=True,
+            created_at__lte=stale,
+        ).update(created_at=now):
+            return record, True
+
+        return record, False
+
+    return None, False
+
+
+def idempotent(view_method):
+    '''Make a view method replay its response for a repeated key'''
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            return _error(
+                f'{HEADER} is too long.', status.HTTP_400_BAD_REQUEST,
+            )
+
+        fingerprint = request_fingerprint(request)
+        record, claimed = _claim(request.user, key, fingerprint)
+        if not claimed:
+            if record is not None and record.fingerprint != fingerprint:
+                return _error(
+                    f'{HEADER} was already used for another request.',
+                    status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if record is None or record.status_code is None:
+                return _error(
+                    f'A request with this {HEADER} is in progress.',
+                    status.HTTP_409_CONFLICT,
+                )
+            return Response(
+                record.response_body,
+                status=record.status_code,
+                headers={REPLAYED_HEADER: 'true'},
+            )
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            # nothing was stored, let the client retry
+            record.delete()
+            raise
+
+        if response.status_code >= 500:
+            record.delete()
+        else:
+            record.status_code = response.status_code
+            record.response_body = response.data
+            record.save(update_fields=['status_code', 'response_body'])
+
+        return response
+
+    return wrapper
@@ -0,0 +1,19 @@
+"""
+Helpers to defer importing rarely used modules until first use.
+"""
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+
+
+def lazy_view(dotted_path, **initkwargs):
+    '''Class based view imported on its first request'''
+    view = None
+
+    @csrf_exempt
+    def wrapper(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(dotted_path).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,201 @@
+# django command to benchmark the API against the configured database
+
+from decimal import Decimal
+import io
+import json
+import math
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from core.models import Recipe, Tag
+
+
+DEFAULT_BASELINE = os.path.join(
+    settings.BASE_DIR, 'benchmarks', 'baseline.json',
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(values, pct):
+    '''Nearest-rank percentile of a list of numbers'''
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def image_file():
+    content = io.BytesIO()
+    Image.new('RGB', (10, 10)).save(content, format='JPEG')
+    content.seek(0)
+    content.name = 'benchmark.jpg'
+    return content
+
+
+class Command(BaseCommand):
+    # command to measure latency percentiles and query counts
+
+    help = (
+        'Benchmark the recipe API against data created by seed_data and '
+        'compare with a stored baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+        parser.add_argument(
+            '--save', action='store_true',
+            help='Store the results as the new baseline',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Allowed p50 slowdown over baseline, 0.25 is 25%%',
+        )
+
+    def handle(self, *args, **options):
+        user = self._pick_user()
+        client = APIClient()
+        token, created = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        # every request comes from one user, the rate limits would fail
+        # long runs with 429. Views copy DEFAULT_THROTTLE_CLASSES when they
+        # are defined, so overriding the setting here would be too late.
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            MEDIA_ROOT=media_root,
+        ), patch.object(APIView, 'get_throttles', return_value=[]):
+            results = {
+                name: self._measure(scenario, options)
+                for name, scenario in self._scenarios(client, user).items()
+            }
+
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<8} p50={result["p50_ms"]:.2f}ms '
+                f'p90={result["p90_ms"]:.2f}ms '
+                f'p99={result["p99_ms"]:.2f}ms '
+                f'queries={result["queries"]}'
+            )
+
+        if options['save']:
+            os.makedirs(os.path.dirname(options['baseline']), exist_ok=True)
+            with open(options['baseline'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS('Baseline saved'))
+        elif os.path.exists(options['baseline']):
+            self._compare(results, options)
+
+    def _pick_user(self):
+        recipe = Recipe.objects.values('user').annotate(
+            n=Count('id'),
+        ).order_by('-n').first()
+        if recipe is None:
+            raise CommandError('No recipes found, run seed_data first')
+        return Recipe.objects.filter(user=recipe['user']).first().user
+
+    def _scenarios(self, client, user):
+        list_url = reverse('recipe:recipe-list')
+        recipe = Recipe.objects.filter(user=user).order_by('id').first()
+        detail_url = reverse('recipe:recipe-detail', args=[recipe.id])
+        upload_url = reverse('recipe:recipe-upload-image', args=[recipe.id])
+        tag_ids = ','.join(
+            str(pk) for pk in Tag.objects.filter(
+                user=user,
+            ).values_list('id', flat=True)[:2]
+        )
+        payload = {
+            'title': 'Benchmark recipe',
+            'time_mins': 10,
+            'price': Decimal('4.50'),
+            'tags': [{'name': 'Quick'}, {'name': 'Benchmark'}],
+            'ingredients': [{'name': 'Salt'}, {'name': 'Benchmark'}],
+        }
+
+        return {
+            'list': lambda: client.get(list_url),
+            'filter': lambda: client.get(list_url, {'tags': tag_ids}),
+            'detail': lambda: client.get(detail_url),
+            'create': lambda: client.post(list_url, payload, format='json'),
+            'upload': lambda: client.post(
+                upload_url,
+                {'image': image_file()},
+                format='multipart',
+            ),
+        }
+
+    def _measure(self, scenario, options):
+        timings = []
+        queries = 0
+        for i in range(options['warmup'] + options['iterations']):
+            # keep the capped query log from hiding queries
+            connection.queries_log.clear()
+            try:
+                # every request is rolled back so runs are repeatable
+                with transaction.atomic():
+                    with CaptureQueriesContext(connection) as captured:
+                        start = time.perf_counter()
+                        response = scenario()
+                        elapsed = time.perf_counter() - start
+                    raise Rollback
+            except Rollback:
+                pass
+            if response.status_code >= 400:
+                raise CommandError(
+                    f'Request failed with {response.status_code}'
+                )
+            if i >= options['warmup']:
+                timings.append(elapsed * 1000)
+                queries = max(queries, len(captured))
+
+        return {
+            'p50_ms': percentile(timings, 50),
+            'p90_ms': percentile(timings, 90),
+            'p99_ms': percentile(timings, 99),
+            'queries': queries,
+        }
+
+    def _compare(self, results, options):
+        with open(options['baseline']) as f:
+            baseline = json.load(f)
+
+        failures = []
+        for name, result in results.items():
+            expected = baseline.get(name)
+            if expected is None:
+                continue
+            if result['queries'] > expected['queries']:
+                failures.append(
+                    f'{name}: {result["queries"]} queries, '
+                    f'baseline {expected["queries"]}'
+                )
+            limit = expected['p50_ms'] * (1 + options['tolerance'])
+            if result['p50_ms'] > limit:
+                failures.append(
+                    f'{name}: p50 {result["p50_ms"]:.2f}ms, '
+                    f'baseline {expected["p50_ms"]:.2f}ms'
+                )
+
+        if failures:
+            raise CommandError(
+                'Performance regression:\n' + '\n'.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS('No regressions'))
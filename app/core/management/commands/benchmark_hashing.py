@@ -0,0 +1,66 @@
+# django command to measure password hashing throughput
+
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+
+PASSWORD = 'benchmark-password'
+
+
+class Command(BaseCommand):
+    # command to measure logins per second for the configured hashers
+
+    help = 'Measure password checks per second on one core and threaded'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hasher', action='append',
+            choices=list(settings.PASSWORD_HASHERS_BY_NAME),
+            help='Hasher to measure, repeatable, defaults to all',
+        )
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument(
+            '--threads', type=int, default=4,
+            help='Threads for the concurrent run',
+        )
+
+    def handle(self, *args, **options):
+        names = options['hasher'] or list(settings.PASSWORD_HASHERS_BY_NAME)
+        for name in names:
+            hasher = import_string(settings.PASSWORD_HASHERS_BY_NAME[name])()
+            try:
+                encoded = hasher.encode(PASSWORD, hasher.salt())
+            except ValueError as exc:
+                # hasher library isn't installed
+                self.stdout.write(f'{name:<8} skipped: {exc}')
+                continue
+            self._measure(name, encoded, options)
+
+    def _measure(self, name, encoded, options):
+        iterations = options['iterations']
+        threads = options['threads']
+
+        def login(i):
+            check_password(PASSWORD, encoded)
+
+        start = time.perf_counter()
+        for i in range(iterations):
+            login(i)
+        serial = iterations / (time.perf_counter() - start)
+
+        # hashing releases the GIL, so threads show how well one worker
+        # keeps serving other requests while logins are running
+        start = time.perf_counter()
+        with ThreadPoolExecutor(threads) as executor:
+            list(executor.map(login, range(iterations * threads)))
+        threaded = iterations * threads / (time.perf_counter() - start)
+
+        self.stdout.write(
+            f'{name:<8} {serial:8.1f} logins/s on one core, '
+            f'{threaded:8.1f} logins/s with {threads} threads'
+        )
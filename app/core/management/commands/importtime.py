@@ -0,0 +1,79 @@
+# django command to report module import cost of booting the app
+
+import json
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+# mirrors what a worker does before serving its first request
+BOOT = '''
+import json, resource, sys
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({
+    'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'heavy': sorted(m for m in %r if m in sys.modules),
+}))
+'''
+HEAVY_MODULES = (
+    'PIL.Image',
+    'django.contrib.admin',
+    'drf_spectacular.generators',
+    'drf_spectacular.views',
+)
+
+
+def parse_importtime(stderr):
+    '''Return [(module, self_us, cumulative_us)] from -X importtime'''
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split(
+            '|',
+        )
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+class Command(BaseCommand):
+    # command to find slow imports at worker boot
+
+    help = 'Report the slowest imports and peak RSS of booting the app'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20)
+
+    def handle(self, *args, **options):
+        boot_code = BOOT % (HEAVY_MODULES,)
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', boot_code],
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr)
+
+        rows = parse_importtime(result.stderr)
+        boot = json.loads(result.stdout.strip().splitlines()[-1])
+        total_ms = sum(self_us for module, self_us, cumulative in rows) / 1000
+
+        self.stdout.write(f'{"cumulative ms":>14} {"self ms":>8}  module')
+        slowest = sorted(rows, key=lambda row: row[2], reverse=True)
+        for module, self_us, cumulative_us in slowest[:options['top']]:
+            self.stdout.write(
+                f'{cumulative_us / 1000:>14.1f} {self_us / 1000:>8.1f}  '
+                f'{module}'
+            )
+        self.stdout.write(
+            f'Total import time: {total_ms:.1f}ms, '
+            f'{len(rows)} modules, peak RSS {boot["rss_kb"] / 1024:.1f}MB'
+        )
+        self.stdout.write(
+            'Heavy modules loaded at boot: '
+            + (', '.join(boot['heavy']) or 'none')
+        )
@@ -0,0 +1,135 @@
+# django command to load a running deployment with concurrent requests
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import threading
+import time
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.management.commands.benchmark import percentile
+
+
+DEFAULT_RESULTS = os.path.join(
+    settings.BASE_DIR, 'benchmarks', 'concurrency.json',
+)
+
+
+def fetch(url, headers, timeout):
+    '''GET url, return (status, seconds), status 0 if it never answered'''
+    start = time.perf_counter()
+    try:
+        with urlopen(Request(url, headers=headers), timeout=timeout) as r:
+            r.read()
+            status = r.status
+    except HTTPError as exc:
+        status = exc.code
+    except (URLError, OSError):
+        status = 0
+    return status, time.perf_counter() - start
+
+
+def summarize(timings):
+    timings = [seconds * 1000 for seconds in timings]
+    return {
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'p99_ms': round(percentile(timings, 99), 2),
+    }
+
+
+class Command(BaseCommand):
+    # command to compare deployments (APP_SERVER=wsgi/asgi) under load
+
+    help = (
+        'Send concurrent GET requests to a running server and report '
+        'throughput and latency, optionally timing a probe URL meanwhile'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url')
+        parser.add_argument('--token', help='Auth token to send')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument(
+            '--probe',
+            help='URL polled one request at a time while the load runs, '
+                 'e.g. the health check',
+        )
+        parser.add_argument(
+            '--label',
+            help='Store the results under this name, e.g. wsgi or asgi',
+        )
+        parser.add_argument('--results', default=DEFAULT_RESULTS)
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+
+        def load(i):
+            return fetch(options['url'], headers, options['timeout'])
+
+        probes = []
+        done = threading.Event()
+        if options['probe']:
+            prober = threading.Thread(
+                target=self._probe,
+                args=(options['probe'], options['timeout'], probes, done),
+            )
+            prober.start()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            responses = list(executor.map(load, range(options['requests'])))
+        elapsed = time.perf_counter() - start
+        done.set()
+        if options['probe']:
+            prober.join()
+
+        ok = [seconds for status, seconds in responses if status == 200]
+        if not ok:
+            raise CommandError('No request succeeded')
+        result = {
+            'concurrency': options['concurrency'],
+            'requests': options['requests'],
+            'errors': len(responses) - len(ok),
+            'requests_per_second': round(len(ok) / elapsed, 1),
+            **summarize(ok),
+        }
+        self.stdout.write(
+            f'{result["requests_per_second"]} req/s '
+            f'p50={result["p50_ms"]}ms p95={result["p95_ms"]}ms '
+            f'p99={result["p99_ms"]}ms errors={result["errors"]}'
+        )
+        if probes:
+            result['probe'] = summarize(probes)
+            self.stdout.write(
+                f'probe p50={result["probe"]["p50_ms"]}ms '
+                f'p95={result["probe"]["p95_ms"]}ms'
+            )
+
+        if options['label']:
+            self._save(options['results'], options['label'], result)
+
+    def _probe(self, url, timeout, timings, done):
+        while not done.is_set():
+            status, seconds = fetch(url, {}, timeout)
+            if status == 200:
+                timings.append(seconds)
+
+    def _save(self, path, label, result):
+        results = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                results = json.load(f)
+        results[label] = result
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        self.stdout.write(self.style.SUCCESS(f'Saved as {label}'))
@@ -0,0 +1,34 @@
+# django command to migrate only when migrations are pending
+
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.health import has_pending_migrations
+
+
+class Command(BaseCommand):
+    # skip the full migrate command (checks, signals) when up to date
+
+    help = 'Apply migrations only if any are unapplied'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        database = options['database']
+        if not has_pending_migrations(connections[database]):
+            self.stdout.write(
+                f'No migrations to apply '
+                f'({time.monotonic() - start:.2f}s)'
+            )
+            return
+
+        call_command('migrate', database=database, interactive=False)
+        self.stdout.write(self.style.SUCCESS(
+            f'Migrations applied in {time.monotonic() - start:.2f}s'
+        ))
@@ -0,0 +1,41 @@
+# django command to delete the data of users who closed their account
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from user import deletion
+
+
+class Command(BaseCommand):
+    # rows go in small batches so no statement holds locks for long
+
+    help = 'Delete accounts queued for deletion and all their data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to sleep between batches',
+        )
+        parser.add_argument(
+            '--limit', type=int,
+            help='Delete at most this many accounts',
+        )
+
+    def handle(self, *args, **options):
+        users = deletion.pending()
+        if options['limit'] is not None:
+            users = users[:options['limit']]
+
+        deleted = 0
+        for user in users:
+            self.stdout.write(f'Deleting user {user.pk}...')
+            progress = deletion.delete_user(user, options['batch_size'])
+            for what, count in progress:
+                self.stdout.write(f'  deleted {count} {what}')
+                if options['pause']:
+                    time.sleep(options['pause'])
+            deleted += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} accounts'))
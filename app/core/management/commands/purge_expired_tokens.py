@@ -0,0 +1,44 @@
+# django command to delete expired auth tokens in batches
+
+from datetime import timedelta
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+
+class Command(BaseCommand):
+    # small batches keep each delete short and avoid long locks
+
+    help = 'Delete auth tokens idle for longer than TOKEN_TTL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to sleep between batches',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=settings.TOKEN_TTL)
+        expired = Token.objects.filter(created__lte=cutoff)
+        deleted = 0
+        while True:
+            # uses the index on created added by core.0006
+            keys = list(
+                expired.values_list('key', flat=True)[:options['batch_size']]
+            )
+            if not keys:
+                break
+            Token.objects.filter(key__in=keys).delete()
+            deleted += len(keys)
+            self.stdout.write(f'Deleted {deleted} expired tokens...')
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {deleted} expired tokens'
+        ))
@@ -0,0 +1,45 @@
+# django command to delete expired idempotency keys in batches
+
+from datetime import timedelta
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    # small batches keep each delete short and avoid long locks
+
+    help = 'Delete idempotency keys older than IDEMPOTENCY_KEY_TTL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help='Seconds to sleep between batches',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(
+            seconds=settings.IDEMPOTENCY_KEY_TTL,
+        )
+        expired = IdempotencyKey.objects.filter(created_at__lte=cutoff)
+        deleted = 0
+        while True:
+            pks = list(
+                expired.values_list('pk', flat=True)[:options['batch_size']]
+            )
+            if not pks:
+                break
+            IdempotencyKey.objects.filter(pk__in=pks).delete()
+            deleted += len(pks)
+            self.stdout.write(f'Deleted {deleted} expired keys...')
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {deleted} expired idempotency keys'
+        ))
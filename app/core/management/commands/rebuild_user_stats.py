@@ -0,0 +1,24 @@
+# django command to recompute per-user recipe statistics from scratch
+
+from django.core.management.base import BaseCommand
+
+from user import stats
+
+
+class Command(BaseCommand):
+    # signals keep the stats current, this repairs them after bulk
+    # changes that skip signals (raw SQL, bulk_create, queryset.update)
+
+    help = 'Rebuild UserStats and tag/ingredient usage counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        done = 0
+        for done in stats.rebuild_all(options['batch_size']):
+            self.stdout.write(f'Rebuilt stats for {done} users...')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt stats for {done} users'
+        ))
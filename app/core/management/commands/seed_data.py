@@ -0,0 +1,189 @@
+# django command to generate synthetic users, recipes, tags and ingredients
+
+from decimal import Decimal
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.models import Recipe, Tag, Ingredient, normalize_name
+from user import stats
+
+
+TAG_NAMES = [
+    'Breakfast', 'Lunch', 'Dinner', 'Dessert', 'Snack', 'Vegan',
+    'Vegetarian', 'Gluten Free', 'Quick', 'Spicy', 'Italian', 'Mexican',
+    'Indian', 'Thai', 'Comfort', 'Healthy', 'BBQ', 'Baking', 'Soup', 'Salad',
+]
+INGREDIENT_NAMES = [
+    'Salt', 'Pepper', 'Olive Oil', 'Butter', 'Garlic', 'Onion', 'Tomato',
+    'Chicken', 'Beef', 'Rice', 'Pasta', 'Flour', 'Sugar', 'Eggs', 'Milk',
+    'Cheese', 'Basil', 'Lemon', 'Potato', 'Carrot', 'Ginger', 'Chili',
+    'Coconut Milk', 'Spinach', 'Mushroom', 'Soy Sauce', 'Honey', 'Yogurt',
+    'Cumin', 'Paprika',
+]
+TITLE_WORDS = [
+    'Roasted', 'Spiced', 'Creamy', 'Grilled', 'Baked', 'Crispy', 'Slow',
+    'Smoky', 'Fresh', 'Classic', 'Curry', 'Stew', 'Bowl', 'Pie', 'Tacos',
+    'Risotto', 'Noodles', 'Salad', 'Soup', 'Cake',
+]
+
+
+def _names(base_names, count):
+    '''Return count unique names, suffixing once base names run out'''
+    return [
+        base_names[i % len(base_names)]
+        + (f' {i // len(base_names) + 1}' if i >= len(base_names) else '')
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    # command to generate realistic data at a configurable scale
+
+    help = 'Generate synthetic users, recipes, tags and ingredients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument(
+            '--recipes', type=int, default=100,
+            help='Recipes per user',
+        )
+        parser.add_argument(
+            '--tags', type=int, default=20,
+            help='Tags per user',
+        )
+        parser.add_argument(
+            '--ingredients', type=int, default=30,
+            help='Ingredients per user',
+        )
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=6)
+        parser.add_argument('--email-prefix', default='seed')
+        parser.add_argument('--password', default='seedpass123')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Random seed, the same seed generates the same data',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        prefix = options['email_prefix']
+        if get_user_model().objects.filter(
+            email__startswith=f'{prefix}-',
+        ).exists():
+            raise CommandError(
+                f'Users with email prefix "{prefix}-" already exist'
+            )
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            users = self._create_users(options, prefix, batch_size)
+            tags = self._create_attrs(
+                Tag, users, _names(TAG_NAMES, options['tags']), batch_size,
+            )
+            ingredients = self._create_attrs(
+                Ingredient,
+                users,
+                _names(INGREDIENT_NAMES, options['ingredients']),
+                batch_size,
+            )
+            recipes = self._create_recipes(
+                users, options['recipes'], rng, batch_size,
+            )
+            self._link(
+                Recipe.tags.through, 'tag_id', recipes, tags,
+                options['tags_per_recipe'], rng, batch_size,
+            )
+            self._link(
+                Recipe.ingredients.through, 'ingredient_id', recipes,
+                ingredients, options['ingredients_per_recipe'], rng,
+                batch_size,
+            )
+            # bulk inserts skip the signals that keep stats current
+            stats.rebuild(users, batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(users)} users and '
+            f'{sum(len(ids) for ids in recipes.values())} recipes '
+            f'in {time.perf_counter() - start:.1f}s'
+        ))
+
+    def _create_users(self, options, prefix, batch_size):
+        User = get_user_model()
+        # hash once, every seeded user shares the password
+        password = make_password(options['password'])
+        emails = [
+            f'{prefix}-{i}@example.com' for i in range(options['users'])
+        ]
+        User.objects.bulk_create(
+            [
+                User(email=email, name=f'Seed User {i}', password=password)
+                for i, email in enumerate(emails)
+            ],
+            batch_size=batch_size,
+        )
+        return list(
+            User.objects.filter(email__in=emails)
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+
+    def _create_attrs(self, model, users, names, batch_size):
+        model.objects.bulk_create(
+            [
+                model(
+                    user_id=user,
+                    name=name,
+                    normalized_name=normalize_name(name),
+                )
+                for user in users for name in names
+            ],
+            batch_size=batch_size,
+        )
+        return self._ids_by_user(model, users)
+
+    def _create_recipes(self, users, count, rng, batch_size):
+        Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    user_id=user,
+                    title=' '.join(rng.sample(TITLE_WORDS, 3)),
+                    description='Synthetic recipe generated by seed_data',
+                    time_mins=rng.randint(5, 180),
+                    price=Decimal(rng.randint(100, 9999)) / 100,
+                    link=f'https://example.com/recipes/{user}/{i}',
+                )
+                for user in users for i in range(count)
+            ],
+            batch_size=batch_size,
+        )
+        return self._ids_by_user(Recipe, users)
+
+    def _ids_by_user(self, model, users):
+        ids = {user: [] for user in users}
+        rows = model.objects.filter(user_id__in=users).order_by(
+            'id',
+        ).values_list('user_id', 'id')
+        for user, pk in rows:
+            ids[user].append(pk)
+        return ids
+
+    def _link(self, through, field, recipes, attrs, per_recipe, rng,
+              batch_size):
+        links = []
+        for user, recipe_ids in recipes.items():
+            choices = attrs[user]
+            for recipe_id in recipe_ids:
+                for attr_id in rng.sample(
+                    choices, min(per_recipe, len(choices)),
+                ):
+                    links.append(
+                        through(recipe_id=recipe_id, **{field: attr_id})
+                    )
+        through.objects.bulk_create(links, batch_size=batch_size)
@@ -1,25 +1,67 @@
 # django command for wait for db to be available
 
+import random
 import time
 from psycopg2 import OperationalError as Psycopg2Error
 
+from django.db import connections
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
     # command to wait for db
 
+    # system checks don't need the db, skip them to start faster
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--timeout', type=float, default=None,
+            help='Give up after this many seconds, waits forever if unset',
+        )
+        parser.add_argument(
+            '--connect-timeout', type=int, default=2,
+            help='Seconds allowed for a single connection attempt',
+        )
+        parser.add_argument('--initial-delay', type=float, default=0.1)
+        parser.add_argument('--max-delay', type=float, default=2.0)
+
+    def _probe(self, alias, connect_timeout):
+        # open and close a raw connection, skipping the system checks
+        connection = connections[alias]
+        params = connection.get_connection_params()
+        if connection.vendor == 'postgresql':
+            params['connect_timeout'] = connect_timeout
+        connection.get_new_connection(params).close()
+
     def handle(self, *args, **options):
         # entry for command
         self.stdout.write('Waiting for db...')
-        db_up = False
-        while db_up is False:
+        start = time.monotonic()
+        delay = options['initial_delay']
+        while True:
             try:
-                self.check(databases=['default'])
-                db_up = True
+                self._probe(options['database'], options['connect_timeout'])
+                break
             except (Psycopg2Error, OperationalError):
-                self.stdout.write('db unavailable waiting 1 sec...')
-                time.sleep(1)
+                elapsed = time.monotonic() - start
+                timeout = options['timeout']
+                if timeout is not None and elapsed >= timeout:
+                    raise CommandError(
+                        f'db unavailable after {elapsed:.2f}s'
+                    )
+                # exponential backoff with jitter so replicas starting
+                # together don't retry in lockstep
+                sleep = delay / 2 + random.uniform(0, delay / 2)
+                if timeout is not None:
+                    sleep = min(sleep, timeout - elapsed)
+                self.stdout.write(f'db unavailable waiting {sleep:.2f} sec...')
+                time.sleep(sleep)
+                delay = min(delay * 2, options['max_delay'])
 
-        self.stdout.write(self.style.SUCCESS('db available'))
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'db available after {elapsed:.2f}s'
+        ))
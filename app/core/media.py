@@ -0,0 +1,43 @@
+"""
+Serving uploaded files after the API has checked access to them.
+
+Files are not public, there is no nginx alias for MEDIA_ROOT. A view
+checks the user may see a file and returns serve(), an empty response
+whose X-Accel-Redirect header tells nginx to send the file from an
+internal location. nginx then handles sendfile, range requests and
+conditional requests, and the bytes never pass through an app worker.
+With DEBUG there is no nginx in front, the file is streamed by Django.
+"""
+import mimetypes
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import patch_cache_control
+
+
+def serve(field_file):
+    '''Response delivering field_file, through nginx unless DEBUG'''
+    content_type = (
+        mimetypes.guess_type(field_file.name)[0]
+        or 'application/octet-stream'
+    )
+    if settings.DEBUG:
+        response = FileResponse(
+            field_file.open('rb'), content_type=content_type,
+        )
+    else:
+        # nginx passes Cache-Control on and sends the file's own type
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(field_file.name)
+        )
+    # private, shared caches must not hand the file to other users
+    patch_cache_control(
+        response,
+        private=True,
+        max_age=settings.MEDIA_CACHE_SECONDS,
+        immutable=True,
+    )
+
+    return response
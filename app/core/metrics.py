@@ -0,0 +1,60 @@
+"""
+Prometheus metrics for the API.
+
+When PROMETHEUS_MULTIPROC_DIR is set (see scripts/run.sh) every worker
+writes its samples to files in that directory and the metrics endpoint
+aggregates them, so a scrape covers all uWSGI/gunicorn workers.
+"""
+import os
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    REGISTRY,
+    multiprocess,
+)
+
+
+REQUEST_LATENCY = Histogram(
+    'api_request_duration_seconds',
+    'API request latency by view',
+    ['view', 'method'],
+)
+REQUESTS = Counter(
+    'api_requests_total',
+    'API requests by view and response status',
+    ['view', 'method', 'status'],
+)
+REQUEST_QUERIES = Histogram(
+    'api_request_queries',
+    'SQL queries executed per request',
+    ['view', 'method'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, float('inf')),
+)
+DB_CONNECT_LATENCY = Histogram(
+    'db_connect_duration_seconds',
+    'Time taken to open a new database connection',
+)
+DB_HEALTH_CHECK_FAILURES = Counter(
+    'db_health_check_failures_total',
+    'Reused database connections found unusable',
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total',
+    'Cache lookups by cache name and result',
+    ['cache', 'result'],
+)
+
+
+def record_cache(name, hit):
+    CACHE_REQUESTS.labels(name, 'hit' if hit else 'miss').inc()
+
+
+def get_registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+
+    return REGISTRY
@@ -0,0 +1,267 @@
+"""
+Middleware for request observability.
+"""
+import asyncio
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from core import metrics
+
+
+logger = logging.getLogger('core.profiling')
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+
+class QueryRecorder:
+    '''Execute wrapper collecting SQL statements and their durations'''
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def seconds(self):
+        return sum(duration for sql, duration in self.queries)
+
+    def duplicates(self):
+        '''Statements run more than once, the signature of an N+1'''
+        counts = Counter(sql for sql, duration in self.queries)
+        return {sql: count for sql, count in counts.items() if count > 1}
+
+
+class QueryCounter:
+    '''Execute wrapper counting SQL statements'''
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = QueryRecorder()
+        self.start = time.perf_counter()
+        self.view_start = None
+        self.view_end = None
+        self.view_db_start = 0.0
+        self.view_db_end = None
+
+    def timings(self, end):
+        '''Return phase durations in milliseconds'''
+        timings = {
+            'total': end - self.start,
+            'db': self.queries.seconds,
+        }
+        if self.view_start is not None:
+            view_end = self.view_end or end
+            view_db_end = self.view_db_end or self.queries.seconds
+            # python time spent in the view, mostly serialization
+            timings['view'] = (
+                view_end - self.view_start
+                - (view_db_end - self.view_db_start)
+            )
+        if self.view_end is not None:
+            timings['render'] = end - self.view_end
+
+        return {
+            name: round(seconds * 1000, 3)
+            for name, seconds in timings.items()
+        }
+
+
+class ProfilingMiddleware:
+    '''Opt-in per request timing and SQL breakdown
+
+    A request is profiled when it sends ``X-Profile: 1`` and
+    PROFILING_HEADER_ENABLED is set, or at random for a
+    PROFILING_SAMPLE_RATE fraction of requests. Profiled responses get a
+    ``Server-Timing`` header and a JSON log line on ``core.profiling``;
+    with PROFILING_DUMP_DIR set a cProfile dump is written as well.
+    '''
+
+    def __init__(self, get_response):
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.header_enabled = settings.PROFILING_HEADER_ENABLED
+        self.dump_dir = settings.PROFILING_DUMP_DIR
+        if not self.sample_rate and not self.header_enabled:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def _should_profile(self, request):
+        if self.header_enabled and request.META.get(PROFILE_HEADER) == '1':
+            return True
+        return random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self._should_profile(request):
+            return self.get_response(request)
+
+        profile = request._profile = RequestProfile()
+        profiler = cProfile.Profile() if self.dump_dir else None
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(
+                    profile.queries,
+                ))
+            if profiler:
+                profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler:
+                    profiler.disable()
+        end = time.perf_counter()
+
+        timings = profile.timings(end)
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration}' for name, duration in timings.items()
+        )
+        duplicates = profile.queries.duplicates()
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'timings_ms': timings,
+            'queries': profile.queries.count,
+            'duplicate_queries': sum(duplicates.values()) - len(duplicates),
+            'response_bytes': (
+                None if response.streaming else len(response.content)
+            ),
+        }
+        if duplicates:
+            record['most_duplicated'] = max(duplicates, key=duplicates.get)
+        if profiler:
+            record['profile'] = self._dump(profiler, request)
+        logger.info(json.dumps(record))
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        profile = getattr(request, '_profile', None)
+        if profile is not None:
+            profile.view_start = time.perf_counter()
+            profile.view_db_start = profile.queries.seconds
+
+    def process_template_response(self, request, response):
+        # called between the view returning and the response rendering
+        profile = getattr(request, '_profile', None)
+        if profile is not None:
+            profile.view_end = time.perf_counter()
+            profile.view_db_end = profile.queries.seconds
+        return response
+
+    def _dump(self, profiler, request):
+        slug = re.sub(r'[^a-zA-Z0-9]+', '-', request.path).strip('-')
+        filename = f'{time.time():.6f}-{request.method}-{slug}.prof'
+        path = os.path.join(self.dump_dir, filename)
+        profiler.dump_stats(path)
+        return path
+
+
+# counter of the request being served, copied into the threads that run
+# sync code for an async request, where their own connections live
+_request_queries = ContextVar('request_queries', default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _request_queries.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def _install_query_counter(sender, connection, **kwargs):
+    # fired again when a closed connection reconnects
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+class MetricsMiddleware:
+    '''Record latency, status and query count per view for Prometheus
+
+    Works in both modes like Django's own middleware. It is first in
+    MIDDLEWARE, a sync only version would run the whole chain in a thread
+    under ASGI, async views included. Queries are counted by a wrapper
+    installed on every connection as it is opened (the module is loaded
+    by CoreConfig.ready), whichever thread opens it.
+    '''
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # what MiddlewareMixin does so the handler awaits __call__
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        queries = QueryCounter()
+        token = _request_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        self._record(request, response, queries, start)
+
+        return response
+
+    async def __acall__(self, request):
+        queries = QueryCounter()
+        token = _request_queries.set(queries)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        self._record(request, response, queries, start)
+
+        return response
+
+    def _record(self, request, response, queries, start):
+        duration = time.perf_counter() - start
+
+        # label by route name, never by raw path, to bound cardinality
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        metrics.REQUEST_LATENCY.labels(view, request.method).observe(duration)
+        metrics.REQUESTS.labels(
+            view,
+            request.method,
+            response.status_code,
+        ).inc()
+        metrics.REQUEST_QUERIES.labels(view, request.method).observe(
+            queries.count,
+        )
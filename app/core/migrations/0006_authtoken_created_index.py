@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+INDEX_NAME = 'core_authtoken_created_idx'
+
+
+def create_index(apps, schema_editor):
+    # build without blocking writes on postgres, the table can be large
+    concurrently = (
+        'CONCURRENTLY '
+        if schema_editor.connection.vendor == 'postgresql' else ''
+    )
+    schema_editor.execute(
+        f'CREATE INDEX {concurrently}IF NOT EXISTS {INDEX_NAME} '
+        'ON authtoken_token (created)'
+    )
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0005_recipe_image'),
+        ('authtoken', '0003_tokenproxy'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
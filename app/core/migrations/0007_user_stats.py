@@ -0,0 +1,74 @@
+# Generated by Django 4.0.10 on 2026-10-19 09:36
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def backfill(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    Recipe = apps.get_model('core', 'Recipe')
+    UserStats = apps.get_model('core', 'UserStats')
+    totals = {
+        row.pop('user'): row
+        for row in Recipe.objects.values('user').annotate(
+            recipe_count=Count('id'),
+            total_price=Sum('price'),
+            total_time_mins=Sum('time_mins'),
+        ).order_by()
+    }
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=pk, **totals.get(pk, {}))
+            for pk in User.objects.values_list('pk', flat=True).iterator()
+        ],
+        batch_size=1000,
+    )
+    for name, column in (('tags', 'tag'), ('ingredients', 'ingredient')):
+        through = getattr(Recipe, name).through
+        counts = through.objects.filter(
+            **{column: OuterRef('pk')},
+        ).values(column).annotate(count=Count('*')).values('count')
+        apps.get_model('core', column).objects.update(
+            usage_count=Coalesce(Subquery(counts), 0),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_authtoken_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('recipe_count', models.PositiveIntegerField(default=0)),
+                ('total_price', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_time_mins', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='usage_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='usage_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-usage_count'], name='ingredient_user_usage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-usage_count'], name='tag_user_usage_idx'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
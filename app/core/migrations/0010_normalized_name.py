@@ -0,0 +1,95 @@
+import unicodedata
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+# copies of core.models.normalize_name and recipe.merge.relink as they
+# were when this migration was written, later changes must not alter it
+
+def normalize_name(name):
+    name = unicodedata.normalize('NFKC', name).casefold()
+    return ' '.join(name.split())
+
+
+def relink(through, field, target_id, source_ids, using):
+    quote = using.ops.quote_name
+    table = quote(through._meta.db_table)
+    recipe = quote(through._meta.get_field('recipe').column)
+    column = quote(through._meta.get_field(field).column)
+    placeholders = ', '.join(['%s'] * len(source_ids))
+    sql = (
+        f'{using.ops.insert_statement(ignore_conflicts=True)} '
+        f'{table} ({recipe}, {column}) '
+        f'SELECT DISTINCT {recipe}, %s FROM {table} '
+        f'WHERE {column} IN ({placeholders}) AND {recipe} NOT IN ('
+        f'SELECT {recipe} FROM {table} WHERE {column} = %s'
+        f') {using.ops.ignore_conflicts_suffix_sql(True)}'
+    )
+    with using.cursor() as cursor:
+        cursor.execute(sql, [target_id, *source_ids, target_id])
+
+
+def normalize_and_merge(apps, schema_editor):
+    '''Fill normalized_name and fold duplicates into their oldest row'''
+    Recipe = apps.get_model('core', 'Recipe')
+    connection = schema_editor.connection
+    for name, field in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', name)
+        through = getattr(Recipe, field).through
+        column = model._meta.model_name
+
+        batch = []
+        for obj in model.objects.only('id', 'name').iterator(chunk_size=2000):
+            # a name too long once normalized can't be entered any more,
+            # cut it so the migration still runs
+            obj.normalized_name = normalize_name(obj.name)[:600]
+            batch.append(obj)
+            if len(batch) == 2000:
+                model.objects.bulk_update(batch, ['normalized_name'])
+                batch = []
+        model.objects.bulk_update(batch, ['normalized_name'])
+
+        groups = list(
+            model.objects.values('user', 'normalized_name').annotate(
+                count=Count('id'),
+                target=Min('id'),
+            ).filter(count__gt=1).order_by()
+        )
+        for group in groups:
+            source_ids = list(
+                model.objects.filter(
+                    user=group['user'],
+                    normalized_name=group['normalized_name'],
+                ).exclude(pk=group['target']).values_list('pk', flat=True)
+            )
+            relink(through, column, group['target'], source_ids, connection)
+            model.objects.filter(pk__in=source_ids).delete()
+            model.objects.filter(pk=group['target']).update(
+                usage_count=through.objects.filter(
+                    **{column: group['target']},
+                ).count(),
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='normalized_name',
+            field=models.CharField(default='', editable=False, max_length=600),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='normalized_name',
+            field=models.CharField(default='', editable=False, max_length=600),
+            preserve_default=False,
+        ),
+        migrations.RunPython(normalize_and_merge, migrations.RunPython.noop),
+    ]
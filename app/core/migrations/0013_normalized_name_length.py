@@ -0,0 +1,23 @@
+# Generated by Django 4.0.10 on 2026-10-19 09:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_user_deletion_requested_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingredient',
+            name='normalized_name',
+            field=models.CharField(editable=False, max_length=600),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='normalized_name',
+            field=models.CharField(editable=False, max_length=600),
+        ),
+    ]
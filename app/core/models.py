@@ -1,5 +1,7 @@
+from decimal import Decimal
 from django.db import models
 import os
+import unicodedata
 import uuid
 from django.conf import settings
 from django.contrib.auth.models import (
@@ -16,6 +18,28 @@ def recipe_image_file_path(instance, filename):
     return os.path.join('uploads', 'recipe', filename)
 
 
+# room for names of 255 characters that grow when normalized, yet small
+# enough for a btree index entry even at 4 bytes per character
+NORMALIZED_NAME_MAX_LENGTH = 600
+
+
+def normalize_name(name):
+    '''Key under which tag/ingredient names count as the same'''
+    name = unicodedata.normalize('NFKC', name).casefold()
+    return ' '.join(name.split())
+
+
+class NormalizedNameMixin:
+    '''Keep normalized_name in step with name on save'''
+
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_name(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'normalized_name'}
+        super().save(*args, **kwargs)
+
+
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
@@ -41,6 +65,10 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # set when the user deleted their account, see user.deletion
+    deletion_requested_at = models.DateTimeField(
+        null=True, blank=True, db_index=True,
+    )
 
     objects = UserManager()
 
@@ -61,30 +89,145 @@ class Recipe(models.Model):
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # bumped by every update, see RecipeSerializer.update
+    version = models.PositiveIntegerField(default=1)
+
+    # fields whose loaded values are kept to update UserStats by difference
+    STATS_FIELDS = ('user_id', 'price', 'time_mins')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_stats = {
+            field: instance.__dict__[field]
+            for field in cls.STATS_FIELDS if field in instance.__dict__
+        }
+
+        return instance
 
     def __str__(self):
         return self.title
 
 
-class Tag(models.Model):
+class Tag(NormalizedNameMixin, models.Model):
     '''Tag Object'''
     name = models.CharField(max_length=255)
+    # set from name on save, see normalize_name. Normalizing can lengthen
+    # a name ('ß' -> 'ss'), the serializers reject anything longer
+    normalized_name = models.CharField(
+        max_length=NORMALIZED_NAME_MAX_LENGTH, editable=False,
+    )
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    # recipes linked to it, kept up to date by user.signals
+    usage_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-usage_count'],
+                name='tag_user_usage_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'normalized_name'],
+                name='unique_tag_name_per_user',
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(NormalizedNameMixin, models.Model):
     '''Ingredient Object'''
     name = models.CharField(max_length=255)
+    # set from name on save, see normalize_name. Normalizing can lengthen
+    # a name ('ß' -> 'ss'), the serializers reject anything longer
+    normalized_name = models.CharField(
+        max_length=NORMALIZED_NAME_MAX_LENGTH, editable=False,
+    )
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
     )
+    # recipes linked to it, kept up to date by user.signals
+    usage_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-usage_count'],
+                name='ingredient_user_usage_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'normalized_name'],
+                name='unique_ingredient_name_per_user',
+            ),
+        ]
 
     def __str__(self):
         return self.name
+
+
+class UserStats(models.Model):
+    '''Running totals of a user's recipes, see user.stats'''
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    recipe_count = models.PositiveIntegerField(default=0)
+    total_price = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0,
+    )
+    total_time_mins = models.BigIntegerField(default=0)
+
+    @property
+    def average_price(self):
+        if not self.recipe_count:
+            return None
+        return (self.total_price / self.recipe_count).quantize(
+            Decimal('0.01'),
+        )
+
+    @property
+    def average_time_mins(self):
+        if not self.recipe_count:
+            return None
+        return round(self.total_time_mins / self.recipe_count, 1)
+
+    def __str__(self):
+        return f'Stats for {self.user_id}'
+
+
+class IdempotencyKey(models.Model):
+    '''Stored outcome of a request sent with an Idempotency-Key header'''
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+    )
+    key = models.CharField(max_length=255)
+    # hash of the request, a reused key must come with the same request
+    fingerprint = models.CharField(max_length=64)
+    # unset while the first request is still running
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response_body = models.JSONField(null=True)
+    created_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'key'],
+                name='unique_idempotency_key_per_user',
+            ),
+        ]
+
+    def __str__(self):
+        return self.key
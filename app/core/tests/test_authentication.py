@@ -0,0 +1,89 @@
+"""
+Tests for expiring token authentication.
+"""
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+
+from core.authentication import ExpiringTokenAuthentication, issue_token
+
+
+@override_settings(TOKEN_TTL=3600, TOKEN_REFRESH_INTERVAL=60)
+class ExpiringTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.auth = ExpiringTokenAuthentication()
+
+    def age_token(self, seconds):
+        created = timezone.now() - timedelta(seconds=seconds)
+        Token.objects.filter(pk=self.token.pk).update(created=created)
+
+        return created
+
+    def test_valid_token(self):
+        user, token = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(token, self.token)
+
+    def test_expired_token_rejected(self):
+        self.age_token(3600)
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_use_slides_expiry(self):
+        created = self.age_token(120)
+
+        self.auth.authenticate_credentials(self.token.key)
+
+        self.token.refresh_from_db()
+        self.assertGreater(self.token.created, created)
+
+    def test_no_write_within_refresh_interval(self):
+        created = self.age_token(30)
+
+        with self.assertNumQueries(1):
+            self.auth.authenticate_credentials(self.token.key)
+
+        self.token.refresh_from_db()
+        self.assertEqual(self.token.created, created)
+
+    def test_issue_token_rotates_expired(self):
+        self.age_token(3600)
+
+        token = issue_token(self.user)
+
+        self.assertNotEqual(token.key, self.token.key)
+        self.assertFalse(Token.objects.filter(key=self.token.key).exists())
+
+    def test_issue_token_concurrent_rotation(self):
+        self.age_token(3600)
+        stale = Token.objects.get(pk=self.token.pk)
+        # another login rotates the token after this one read it
+        issued = issue_token(self.user)
+
+        with patch.object(
+            Token.objects, 'get_or_create', return_value=(stale, False),
+        ):
+            token = issue_token(self.user)
+
+        self.assertEqual(token.key, issued.key)
+        self.assertEqual(Token.objects.filter(user=self.user).count(), 1)
+
+    def test_issue_token_keeps_valid(self):
+        self.age_token(120)
+
+        token = issue_token(self.user)
+
+        self.assertEqual(token.key, self.token.key)
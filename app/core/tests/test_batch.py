@@ -0,0 +1,184 @@
+'''Tests for the multiplexed batch endpoint'''
+import threading
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import batch
+from core.models import Recipe, Tag
+
+
+BATCH_URL = reverse('batch')
+ME_URL = reverse('user:me')
+TAGS_URL = reverse('recipe:tag-list')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_user():
+    return get_user_model().objects.create_user(
+        email='user@example.com',
+        password='testpass123',
+        name='Test User',
+    )
+
+
+class BatchTests(TestCase):
+    def setUp(self):
+        caches['throttle'].clear()
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def test_auth_required(self):
+        self.client.force_authenticate(None)
+
+        response = self.client.post(
+            BATCH_URL,
+            {'requests': [{'path': ME_URL}]},
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_combined_responses_in_order(self):
+        Tag.objects.create(user=self.user, name='Vegan')
+        payload = {'requests': [
+            {'path': ME_URL},
+            {'path': TAGS_URL},
+            {
+                'method': 'POST',
+                'path': RECIPES_URL,
+                'body': {'title': 'Soup', 'time_mins': 5, 'price': '2.50'},
+            },
+            {'path': f'{RECIPES_URL}?tags=1'},
+        ]}
+
+        response = self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        me, tags, created, recipes = response.data['responses']
+        self.assertEqual(me['status'], 200)
+        self.assertEqual(me['body']['email'], self.user.email)
+        self.assertEqual(tags['body'][0]['name'], 'Vegan')
+        self.assertEqual(created['status'], 201)
+        self.assertTrue(Recipe.objects.filter(user=self.user).exists())
+        self.assertEqual(recipes['status'], 200)
+
+    def test_token_authenticates_sub_requests_once(self):
+        token = Token.objects.create(user=self.user)
+        self.client.force_authenticate(None)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        payload = {'requests': [{'path': ME_URL}, {'path': TAGS_URL}]}
+
+        with patch(
+            'core.authentication.ExpiringTokenAuthentication'
+            '.authenticate_credentials',
+            return_value=(self.user, token),
+        ) as authenticate:
+            response = self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(authenticate.call_count, 1)
+        statuses = [sub['status'] for sub in response.data['responses']]
+        self.assertEqual(statuses, [200, 200])
+
+    def test_disallowed_paths_not_found(self):
+        payload = {'requests': [
+            {'method': 'POST', 'path': reverse('user:token')},
+            {'path': BATCH_URL},
+            {'path': '/api/unknown/'},
+        ]}
+
+        response = self.client.post(BATCH_URL, payload, format='json')
+
+        statuses = [sub['status'] for sub in response.data['responses']]
+        self.assertEqual(statuses, [404, 404, 404])
+
+    @override_settings(BATCH_MAX_REQUESTS=1)
+    def test_too_many_requests_rejected(self):
+        payload = {'requests': [{'path': ME_URL}, {'path': TAGS_URL}]}
+
+        response = self.client.post(BATCH_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_concurrent_reads_use_pool_and_writes_run_alone(self):
+        calls = []
+
+        def fake_dispatch(request, method, path, body=None):
+            calls.append((method, threading.get_ident()))
+            return {'status': 200, 'body': None}
+
+        sub_requests = [
+            {'method': 'GET', 'path': ME_URL},
+            {'method': 'GET', 'path': TAGS_URL},
+            {'method': 'POST', 'path': RECIPES_URL},
+            {'method': 'GET', 'path': TAGS_URL},
+        ]
+        with patch('core.batch.dispatch', side_effect=fake_dispatch):
+            responses = batch.run_batch(None, sub_requests, concurrent=True)
+
+        self.assertEqual(len(responses), 4)
+        main = threading.get_ident()
+        threads = [ident for method, ident in calls]
+        self.assertNotEqual(threads[0], main)
+        self.assertNotEqual(threads[1], main)
+        self.assertEqual(threads[2:], [main, main])
+
+    @override_settings(BATCH_MAX_WORKERS=2)
+    def test_pool_threads_connect_once(self):
+        # each thread keeps its connection until it has no reads left
+        local = threading.local()
+        opened = []
+
+        def fake_dispatch(request, method, path, body=None):
+            if not getattr(local, 'connected', False):
+                local.connected = True
+                opened.append(threading.get_ident())
+            return {'status': 200, 'body': path}
+
+        def fake_close_all():
+            local.connected = False
+
+        sub_requests = [
+            {'method': 'GET', 'path': f'{TAGS_URL}?page={i}'}
+            for i in range(6)
+        ]
+        with patch('core.batch.dispatch', side_effect=fake_dispatch), \
+                patch.object(
+                    batch.connections, 'close_all', side_effect=fake_close_all,
+                ):
+            responses = batch.run_batch(None, sub_requests, concurrent=True)
+
+        self.assertEqual(
+            [response['body'] for response in responses],
+            [sub['path'] for sub in sub_requests],
+        )
+        self.assertLessEqual(len(opened), 2)
+
+
+class ConcurrentBatchTests(TransactionTestCase):
+    # pool threads use their own connections, the data must be committed
+
+    def test_concurrent_reads(self):
+        caches['throttle'].clear()
+        user = create_user()
+        Tag.objects.create(user=user, name='Vegan')
+        client = APIClient()
+        client.force_authenticate(user)
+        payload = {
+            'requests': [{'path': ME_URL}, {'path': TAGS_URL}],
+            'concurrent': True,
+        }
+
+        response = client.post(BATCH_URL, payload, format='json')
+
+        me, tags = response.data['responses']
+        self.assertEqual(me['body']['email'], user.email)
+        self.assertEqual(tags['body'][0]['name'], 'Vegan')
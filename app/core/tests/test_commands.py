@@ -1,30 +1,316 @@
 # test custom django management commands
 
+from datetime import timedelta
+from io import StringIO
+import json
+import os
+import tempfile
 from unittest.mock import patch
 from psycopg2 import OperationalError as Psycopg2Error
 
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
 
+from core.management.commands import importtime, loadtest, wait_for_db
+from core.models import Recipe, Tag, Ingredient, UserStats
+from core.throttling import UserRateThrottle
 
-@patch('core.management.commands.wait_for_db.Command.check')
+
+@patch('core.management.commands.wait_for_db.Command._probe')
 class CommandTests(SimpleTestCase):
-    def test_wait_for_db_ready(self, patched_check):
+    def test_wait_for_db_ready(self, patched_probe):
         # tests waiting when db is ready
-        patched_check.return_value = True
+        patched_probe.return_value = None
 
-        call_command('wait_for_db')
+        call_command('wait_for_db', stdout=StringIO())
 
-        patched_check.assert_called_once_with(databases=['default'])
+        patched_probe.assert_called_once_with('default', 2)
 
     @patch('time.sleep')
-    def test_wait_for_db_delay(self, patched_sleep, patched_check):
+    def test_wait_for_db_delay(self, patched_sleep, patched_probe):
         # tests waiting for db when getting operational error
-        patched_check.side_effect = [Psycopg2Error] * 2 + \
-            [OperationalError] * 3 + [True]
+        patched_probe.side_effect = [Psycopg2Error] * 2 + \
+            [OperationalError] * 3 + [None]
+
+        call_command('wait_for_db', stdout=StringIO())
+
+        self.assertEqual(patched_probe.call_count, 6)
+        patched_probe.assert_called_with('default', 2)
+        delays = [call.args[0] for call in patched_sleep.call_args_list]
+        self.assertEqual(len(delays), 5)
+        # jittered delays stay within each doubling step
+        for attempt, delay in enumerate(delays):
+            self.assertGreaterEqual(delay, 0.1 * 2 ** attempt / 2)
+            self.assertLessEqual(delay, 0.1 * 2 ** attempt)
+
+    @patch('time.sleep')
+    def test_wait_for_db_max_delay(self, patched_sleep, patched_probe):
+        # tests backoff is capped
+        patched_probe.side_effect = [OperationalError] * 10 + [None]
+
+        call_command('wait_for_db', max_delay=0.5, stdout=StringIO())
+
+        self.assertLessEqual(
+            max(call.args[0] for call in patched_sleep.call_args_list),
+            0.5,
+        )
+
+    @patch('time.sleep')
+    def test_wait_for_db_timeout(self, patched_sleep, patched_probe):
+        # tests giving up once the deadline passes
+        patched_probe.side_effect = OperationalError
+
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', timeout=0, stdout=StringIO())
+
+        patched_sleep.assert_not_called()
+
+
+class WaitForDbProbeTests(SimpleTestCase):
+    @patch('core.management.commands.wait_for_db.connections')
+    def test_probe_opens_raw_connection(self, patched_connections):
+        # tests probing with a short connect timeout
+        connection = patched_connections.__getitem__.return_value
+        connection.vendor = 'postgresql'
+        connection.get_connection_params.return_value = {'host': 'db'}
+
+        wait_for_db.Command()._probe('default', 3)
+
+        connection.get_new_connection.assert_called_once_with(
+            {'host': 'db', 'connect_timeout': 3},
+        )
+        connection.get_new_connection.return_value.close.assert_called_once()
+
+
+class SeedDataCommandTests(TestCase):
+    def test_seed_data(self):
+        # tests generating synthetic data with bulk inserts
+        call_command(
+            'seed_data',
+            users=2,
+            recipes=3,
+            tags=4,
+            ingredients=5,
+            tags_per_recipe=2,
+            ingredients_per_recipe=3,
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(
+            get_user_model().objects.filter(
+                email__startswith='seed-',
+            ).count(),
+            2,
+        )
+        self.assertEqual(Recipe.objects.count(), 6)
+        self.assertEqual(Tag.objects.count(), 8)
+        self.assertEqual(Ingredient.objects.count(), 10)
+        recipe = Recipe.objects.first()
+        self.assertEqual(recipe.tags.count(), 2)
+        self.assertEqual(recipe.ingredients.count(), 3)
+        self.assertEqual(recipe.tags.first().user, recipe.user)
+        self.assertEqual(recipe.user.stats.recipe_count, 3)
+
+    def test_seed_data_existing_prefix(self):
+        # tests refusing to seed over existing seed users
+        call_command('seed_data', users=1, recipes=1, stdout=StringIO())
+
+        with self.assertRaises(CommandError):
+            call_command('seed_data', users=1, recipes=1, stdout=StringIO())
+
+
+class BenchmarkCommandTests(TestCase):
+    def setUp(self):
+        call_command(
+            'seed_data', users=1, recipes=5, stdout=StringIO(),
+        )
+        self.baseline_dir = tempfile.TemporaryDirectory()
+        self.baseline = os.path.join(self.baseline_dir.name, 'baseline.json')
+
+    def tearDown(self):
+        self.baseline_dir.cleanup()
+
+    def test_benchmark_saves_baseline(self):
+        # tests measuring every scenario and storing the baseline
+        out = StringIO()
+        call_command(
+            'benchmark', iterations=2, warmup=0, baseline=self.baseline,
+            save=True, stdout=out,
+        )
+
+        with open(self.baseline) as f:
+            baseline = json.load(f)
+        self.assertEqual(
+            set(baseline),
+            {'list', 'filter', 'detail', 'create', 'upload'},
+        )
+        self.assertGreater(baseline['list']['queries'], 0)
+        # writes are rolled back
+        self.assertEqual(Recipe.objects.count(), 5)
+
+    @patch.object(UserRateThrottle, 'THROTTLE_RATES', {'user': '2/min'})
+    def test_benchmark_not_throttled(self):
+        # tests running more requests than the rate limits allow
+        caches['throttle'].clear()
+        self.addCleanup(caches['throttle'].clear)
+
+        call_command(
+            'benchmark', iterations=3, warmup=0, baseline=self.baseline,
+            save=True, stdout=StringIO(),
+        )
+
+    def test_benchmark_query_regression(self):
+        # tests failing when queries exceed the baseline
+        call_command(
+            'benchmark', iterations=1, warmup=0, baseline=self.baseline,
+            save=True, stdout=StringIO(),
+        )
+        with open(self.baseline) as f:
+            baseline = json.load(f)
+        baseline['detail']['queries'] = 0
+        baseline['detail']['p50_ms'] = 1000
+        with open(self.baseline, 'w') as f:
+            json.dump(baseline, f)
+
+        with self.assertRaises(CommandError):
+            call_command(
+                'benchmark', iterations=1, warmup=0,
+                baseline=self.baseline, tolerance=1000, stdout=StringIO(),
+            )
+
+
+class LoadTestCommandTests(SimpleTestCase):
+    def setUp(self):
+        self.results_dir = tempfile.TemporaryDirectory()
+        self.results = os.path.join(self.results_dir.name, 'results.json')
+
+    def tearDown(self):
+        self.results_dir.cleanup()
+
+    @patch.object(loadtest, 'fetch', return_value=(200, 0.01))
+    def test_loadtest_saves_results(self, patched_fetch):
+        # tests sending every request with the token and storing the run
+        out = StringIO()
+        call_command(
+            'loadtest', 'http://app/api/recipe/recipes/', token='abc',
+            concurrency=4, requests=10, label='wsgi',
+            results=self.results, stdout=out,
+        )
+
+        self.assertEqual(patched_fetch.call_count, 10)
+        patched_fetch.assert_called_with(
+            'http://app/api/recipe/recipes/',
+            {'Authorization': 'Token abc'},
+            30,
+        )
+        with open(self.results) as f:
+            results = json.load(f)
+        self.assertEqual(results['wsgi']['errors'], 0)
+        self.assertEqual(results['wsgi']['p50_ms'], 10)
+        self.assertIn('Saved as wsgi', out.getvalue())
+
+    @patch.object(loadtest, 'fetch', return_value=(502, 0.01))
+    def test_loadtest_all_failed(self, patched_fetch):
+        with self.assertRaises(CommandError):
+            call_command(
+                'loadtest', 'http://app/', requests=2, stdout=StringIO(),
+            )
+
+
+@patch('core.management.commands.migrate_if_needed.call_command')
+@patch('core.management.commands.migrate_if_needed.has_pending_migrations')
+class MigrateIfNeededCommandTests(SimpleTestCase):
+    def test_skips_migrate_when_applied(self, patched_pending, patched_call):
+        # tests the full migrate command isn't run when up to date
+        patched_pending.return_value = False
+
+        call_command('migrate_if_needed', stdout=StringIO())
+
+        patched_call.assert_not_called()
+
+    def test_migrates_when_pending(self, patched_pending, patched_call):
+        # tests migrations are applied when some are unapplied
+        patched_pending.return_value = True
+
+        call_command('migrate_if_needed', stdout=StringIO())
+
+        patched_call.assert_called_once_with(
+            'migrate', database='default', interactive=False,
+        )
+
+
+class ImportTimeCommandTests(SimpleTestCase):
+    def test_parse_importtime(self):
+        # tests parsing python -X importtime output
+        stderr = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   yaml.reader\n'
+            'import time:       300 |       5000 | yaml\n'
+        )
+
+        self.assertEqual(
+            importtime.parse_importtime(stderr),
+            [('yaml.reader', 120, 120), ('yaml', 300, 5000)],
+        )
+
+    def test_importtime_report(self):
+        # tests reporting import cost of booting the app
+        out = StringIO()
+
+        call_command('importtime', top=3, stdout=out)
+
+        report = out.getvalue()
+        self.assertIn('Total import time', report)
+        self.assertIn('peak RSS', report)
+        self.assertNotIn('PIL.Image', report)
+        self.assertNotIn('drf_spectacular.views', report)
+
+
+@override_settings(TOKEN_TTL=3600)
+class PurgeExpiredTokensCommandTests(TestCase):
+    def test_purge_expired_tokens(self):
+        # tests only idle tokens are deleted, across several batches
+        old = timezone.now() - timedelta(hours=2)
+        for i in range(5):
+            user = get_user_model().objects.create_user(
+                email=f'user{i}@example.com', password='testpass123',
+            )
+            token = Token.objects.create(user=user)
+            if i < 3:
+                Token.objects.filter(pk=token.pk).update(created=old)
+
+        out = StringIO()
+        call_command('purge_expired_tokens', batch_size=2, stdout=out)
+
+        self.assertEqual(Token.objects.count(), 2)
+        self.assertIn('Purged 3 expired tokens', out.getvalue())
+
+
+class RebuildUserStatsCommandTests(TestCase):
+    def test_rebuild_user_stats(self):
+        # tests stats are rebuilt for every user across batches
+        call_command(
+            'seed_data', users=3, recipes=4, tags=2, ingredients=2,
+            stdout=StringIO(),
+        )
+        UserStats.objects.all().delete()
+        Tag.objects.update(usage_count=0)
 
-        call_command('wait_for_db')
+        out = StringIO()
+        call_command('rebuild_user_stats', batch_size=2, stdout=out)
 
-        self.assertEqual(patched_check.call_count, 6)
-        patched_check.assert_called_with(databases=['default'])
+        self.assertEqual(
+            sorted(UserStats.objects.values_list('recipe_count', flat=True)),
+            [4, 4, 4],
+        )
+        self.assertEqual(
+            sum(Tag.objects.values_list('usage_count', flat=True)),
+            Recipe.tags.through.objects.count(),
+        )
+        self.assertIn('Rebuilt stats for 3 users', out.getvalue())
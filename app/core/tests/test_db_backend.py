@@ -0,0 +1,99 @@
+'''Tests for the custom postgres backend'''
+from unittest.mock import patch, MagicMock
+
+from django.db.backends.postgresql import base as pg_base
+from django.test import SimpleTestCase, override_settings
+
+from core.db import latency
+from core.db.backends.postgresql.base import DatabaseWrapper
+from core.db.stats import connection_stats
+
+
+def make_wrapper(**settings):
+    settings_dict = {
+        'NAME': 'test',
+        'USER': '',
+        'PASSWORD': '',
+        'HOST': '',
+        'PORT': '',
+        'OPTIONS': {},
+        'AUTOCOMMIT': True,
+        'CONN_MAX_AGE': 60,
+        'TIME_ZONE': None,
+    }
+    settings_dict.update(settings)
+    return DatabaseWrapper(settings_dict)
+
+
+class DatabaseWrapperTests(SimpleTestCase):
+    def setUp(self):
+        connection_stats.reset()
+
+    def test_get_new_connection_records_timing(self):
+        wrapper = make_wrapper()
+        with patch.object(pg_base.DatabaseWrapper, 'get_new_connection'):
+            wrapper.get_new_connection({})
+
+        snapshot = connection_stats.snapshot()
+        self.assertEqual(snapshot['connects'], 1)
+        self.assertGreaterEqual(snapshot['connect_seconds_max'], 0)
+
+    @patch.object(DatabaseWrapper, 'connect')
+    @patch.object(DatabaseWrapper, 'is_usable', return_value=False)
+    def test_unusable_connection_replaced(
+        self,
+        patched_usable,
+        patched_connect,
+    ):
+        wrapper = make_wrapper(CONN_HEALTH_CHECKS=True)
+        wrapper.connection = MagicMock()
+
+        with self.assertLogs('core.db.backends.postgresql.base', 'WARNING'):
+            wrapper.ensure_connection()
+
+        patched_usable.assert_called_once()
+        patched_connect.assert_called_once()
+        snapshot = connection_stats.snapshot()
+        self.assertEqual(snapshot['health_check_failures'], 1)
+
+    @patch.object(DatabaseWrapper, 'is_usable', return_value=True)
+    def test_health_check_once_per_request(self, patched_usable):
+        wrapper = make_wrapper(CONN_HEALTH_CHECKS=True)
+        wrapper.connection = MagicMock()
+
+        wrapper.ensure_connection()
+        wrapper.ensure_connection()
+
+        patched_usable.assert_called_once()
+
+    @patch.object(DatabaseWrapper, 'is_usable')
+    def test_health_check_disabled(self, patched_usable):
+        wrapper = make_wrapper(CONN_HEALTH_CHECKS=False)
+        wrapper.connection = MagicMock()
+
+        wrapper.ensure_connection()
+
+        patched_usable.assert_not_called()
+
+
+class InjectedLatencyTests(SimpleTestCase):
+    @override_settings(DB_INJECT_LATENCY_MS=0)
+    def test_not_installed_by_default(self):
+        wrapper = make_wrapper()
+        latency._install_delay(sender=None, connection=wrapper)
+
+        self.assertNotIn(latency.delay_query, wrapper.execute_wrappers)
+
+    @override_settings(DB_INJECT_LATENCY_MS=25)
+    @patch('core.db.latency.time.sleep')
+    def test_delays_every_query(self, patched_sleep):
+        wrapper = make_wrapper()
+        latency._install_delay(sender=None, connection=wrapper)
+        latency._install_delay(sender=None, connection=wrapper)
+        self.assertEqual(wrapper.execute_wrappers, [latency.delay_query])
+
+        execute = MagicMock()
+        latency.delay_query(execute, 'SELECT 1', None, False, {})
+
+        patched_sleep.assert_called_once_with(0.025)
+        execute.assert_called_once_with('SELECT 1', None, False, {})
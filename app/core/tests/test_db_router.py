@@ -0,0 +1,59 @@
+'''Tests for the read replica router'''
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from core.db import routers
+from core.models import Recipe
+
+
+@override_settings(REPLICA_DATABASES=['replica_1'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+
+    def test_reads_use_primary_by_default(self):
+        self.assertIsNone(self.router.db_for_read(Recipe))
+
+    def test_reads_use_replica_when_enabled(self):
+        with routers.replica_reads():
+            self.assertEqual(self.router.db_for_read(Recipe), 'replica_1')
+
+        self.assertIsNone(self.router.db_for_read(Recipe))
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_no_replicas_configured(self):
+        with routers.replica_reads():
+            self.assertIsNone(self.router.db_for_read(Recipe))
+
+    def test_writes_use_primary(self):
+        with routers.replica_reads():
+            self.assertIsNone(self.router.db_for_write(Recipe))
+
+    def test_replicas_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica_1', 'core'))
+        self.assertIsNone(self.router.allow_migrate('default', 'core'))
+
+
+@override_settings(REPLICA_STICKY_SECONDS=5)
+class StickyPrimaryTests(SimpleTestCase):
+    def setUp(self):
+        caches['routing'].clear()
+
+    def test_pin_to_primary(self):
+        user = get_user_model()(pk=1, email='a@example.com')
+        other = get_user_model()(pk=2, email='b@example.com')
+
+        routers.pin_to_primary(user)
+
+        self.assertTrue(routers.is_pinned_to_primary(user))
+        self.assertFalse(routers.is_pinned_to_primary(other))
+
+    def test_pin_kept_in_shared_routing_cache(self):
+        user = get_user_model()(pk=1, email='a@example.com')
+
+        routers.pin_to_primary(user)
+
+        # not the per-process default cache, other workers must see it
+        self.assertIsNone(caches['default'].get('replica-sticky:1'))
+        self.assertTrue(caches['routing'].get('replica-sticky:1'))
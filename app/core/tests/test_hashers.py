@@ -0,0 +1,90 @@
+'''Tests for configurable password hashing'''
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+TOKEN_URL = reverse('user:token')
+PBKDF2 = 'core.hashers.PBKDF2PasswordHasher'
+ARGON2 = 'core.hashers.Argon2PasswordHasher'
+BCRYPT = 'core.hashers.BCryptSHA256PasswordHasher'
+
+
+@override_settings(PASSWORD_HASHERS=[PBKDF2, ARGON2])
+class HasherTests(TestCase):
+    def setUp(self):
+        caches['throttle'].clear()
+        self.client = APIClient()
+
+    def _create_user(self):
+        return get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+
+    def _login(self):
+        return self.client.post(
+            TOKEN_URL,
+            {'email': 'user@example.com', 'password': 'testpass123'},
+        )
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_iterations_from_settings(self):
+        encoded = make_password('testpass123')
+
+        self.assertTrue(encoded.startswith('pbkdf2_sha256$1000$'))
+
+    @override_settings(PASSWORD_HASHERS=[BCRYPT], PASSWORD_BCRYPT_ROUNDS=4)
+    def test_bcrypt_available(self):
+        user = self._create_user()
+
+        self.assertTrue(user.password.startswith('bcrypt_sha256$'))
+        self.assertEqual(self._login().status_code, status.HTTP_200_OK)
+
+    def test_rehash_on_login_when_cost_changes(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            user = self._create_user()
+
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            response = self._login()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$2000$'))
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_rehash_on_login_when_hasher_changes(self):
+        user = self._create_user()
+
+        with override_settings(
+            PASSWORD_HASHERS=[ARGON2, PBKDF2],
+            PASSWORD_ARGON2_TIME_COST=1,
+            PASSWORD_ARGON2_MEMORY_COST=1024,
+            PASSWORD_ARGON2_PARALLELISM=1,
+        ):
+            response = self._login()
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            user.refresh_from_db()
+            self.assertTrue(user.password.startswith('argon2$'))
+            self.assertTrue(user.check_password('testpass123'))
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_benchmark_hashing(self):
+        out = StringIO()
+
+        call_command(
+            'benchmark_hashing', hasher=['pbkdf2'], iterations=2, threads=2,
+            stdout=out,
+        )
+
+        self.assertIn('pbkdf2', out.getvalue())
+        self.assertIn('logins/s with 2 threads', out.getvalue())
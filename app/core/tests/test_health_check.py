@@ -1,9 +1,15 @@
+import asyncio
+from unittest.mock import patch
+
+from asgiref.sync import AsyncToSync
 from django.test import TestCase
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core import views
+
 
 class HealthCheckTestCase(TestCase):
     def setUp(self):
@@ -13,3 +19,20 @@ class HealthCheckTestCase(TestCase):
         url = reverse('health-check')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'healthy': True})
+
+    def test_health_check_is_async(self):
+        # health check must run natively under the ASGI server
+        self.assertTrue(asyncio.iscoroutinefunction(views.health_check))
+
+    async def test_health_check_native_under_asgi(self):
+        # one sync only middleware makes Django run the whole chain in a
+        # thread and reach the async view through AsyncToSync
+        with patch.object(
+            AsyncToSync, '__call__', autospec=True,
+            side_effect=AsyncToSync.__call__,
+        ) as adapted:
+            response = await self.async_client.get(reverse('health-check'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        adapted.assert_not_called()
@@ -0,0 +1,27 @@
+'''Tests for lazily imported views'''
+from unittest.mock import patch
+
+from django.test import RequestFactory, SimpleTestCase
+
+from core.lazy import lazy_view
+
+
+class LazyViewTests(SimpleTestCase):
+    @patch('core.lazy.import_string')
+    def test_view_imported_on_first_request(self, patched_import):
+        view = lazy_view('app.views.SomeView', url_name='api-schema')
+        patched_import.assert_not_called()
+
+        request = RequestFactory().get('/')
+        view(request)
+        view(request)
+
+        patched_import.assert_called_once_with('app.views.SomeView')
+        view_class = patched_import.return_value
+        view_class.as_view.assert_called_once_with(url_name='api-schema')
+        self.assertEqual(view_class.as_view.return_value.call_count, 2)
+
+    def test_schema_served(self):
+        response = self.client.get('/api/schema/')
+
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,86 @@
+'''Tests for the metrics endpoint'''
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from prometheus_client import REGISTRY
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+@override_settings(METRICS_TOKEN=None, DEBUG=True)
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_request_metrics_exported(self):
+        user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user)
+        self.client.get(RECIPES_URL)
+
+        response = self.client.get(METRICS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        content = response.content.decode()
+        self.assertIn(
+            'api_request_duration_seconds_count'
+            '{method="GET",view="recipe:recipe-list"}',
+            content,
+        )
+        self.assertIn('api_request_queries_bucket', content)
+        self.assertIn('api_requests_total', content)
+
+    async def test_queries_counted_under_asgi(self):
+        token = await sync_to_async(self._create_token)()
+        labels = {'view': 'recipe:recipe-list', 'method': 'GET'}
+        before = REGISTRY.get_sample_value(
+            'api_request_queries_sum', labels,
+        ) or 0
+
+        # sync views run in a thread, with that thread's connections
+        response = await self.async_client.get(
+            RECIPES_URL, AUTHORIZATION=f'Token {token}',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        after = REGISTRY.get_sample_value('api_request_queries_sum', labels)
+        self.assertGreater(after, before)
+
+    def _create_token(self):
+        user = get_user_model().objects.create_user(
+            email='async@example.com',
+            password='testpass123',
+        )
+        return Token.objects.create(user=user).key
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_required(self):
+        response = self.client.get(METRICS_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.get(
+            METRICS_URL,
+            HTTP_AUTHORIZATION='Bearer wrong',
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.get(
+            METRICS_URL,
+            HTTP_AUTHORIZATION='Bearer secret',
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(DEBUG=False)
+    def test_hidden_without_token(self):
+        response = self.client.get(METRICS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,108 @@
+'''Tests for the request profiling middleware'''
+from decimal import Decimal
+import json
+import os
+import tempfile
+from unittest.mock import Mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.middleware import QueryRecorder
+from core.models import Recipe, Tag
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_recipe(user, tag_name):
+    recipe = Recipe.objects.create(
+        user=user,
+        title='Sample recipe',
+        time_mins=5,
+        price=Decimal('5.50'),
+    )
+    recipe.tags.add(Tag.objects.create(user=user, name=tag_name))
+    return recipe
+
+
+@override_settings(
+    PROFILING_HEADER_ENABLED=True,
+    PROFILING_SAMPLE_RATE=0,
+    PROFILING_DUMP_DIR=None,
+)
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_not_profiled_without_header(self):
+        response = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('Server-Timing', response)
+
+    def test_profiled_with_header(self):
+        with self.assertLogs('core.profiling', level='INFO') as logs:
+            response = self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('view;dur=', response['Server-Timing'])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], RECIPES_URL)
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['queries'], 0)
+        self.assertEqual(record['response_bytes'], len(response.content))
+
+    def test_recipe_list_has_no_duplicate_queries(self):
+        for i in range(3):
+            create_recipe(self.user, f'Tag {i}')
+
+        with self.assertLogs('core.profiling', level='INFO') as logs:
+            self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['duplicate_queries'], 0)
+        self.assertNotIn('most_duplicated', record)
+
+    def test_duplicate_queries_detected(self):
+        recorder = QueryRecorder()
+        execute = Mock()
+        sql = 'SELECT * FROM tag WHERE id = %s'
+        for i in range(3):
+            recorder(execute, sql, [i], False, {})
+        recorder(execute, 'SELECT * FROM recipe', [], False, {})
+
+        self.assertEqual(recorder.count, 4)
+        self.assertEqual(
+            recorder.duplicates(),
+            {sql: 3},
+        )
+
+    @override_settings(PROFILING_HEADER_ENABLED=False)
+    def test_header_ignored_when_disabled(self):
+        response = self.client.get(RECIPES_URL, HTTP_X_PROFILE='1')
+
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampled_request_dumps_profile(self):
+        with tempfile.TemporaryDirectory() as dump_dir:
+            with override_settings(PROFILING_DUMP_DIR=dump_dir):
+                client = APIClient()
+                client.force_authenticate(self.user)
+                with self.assertLogs('core.profiling', level='INFO'):
+                    response = client.get(RECIPES_URL)
+
+                self.assertIn('Server-Timing', response)
+                dumps = os.listdir(dump_dir)
+
+        self.assertEqual(len(dumps), 1)
+        self.assertTrue(dumps[0].endswith('.prof'))
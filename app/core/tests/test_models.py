@@ -84,3 +84,22 @@ class ModelsTest(TestCase):
         file_path = models.recipe_image_file_path(None, 'example.jpg')
 
         self.assertEqual(file_path, f'uploads/recipe/{uuid}.jpg')
+
+    def test_normalize_name(self):
+        '''Test names equal up to case, spacing and unicode form match'''
+        names = ['  Cre\u0300me   BRÛLÉE ', 'crème brûlée', 'CRÈME\tBrûlée']
+
+        self.assertEqual(
+            {models.normalize_name(name) for name in names},
+            {'crème brûlée'},
+        )
+        self.assertEqual(models.normalize_name('Ｔｏｆｕ'), 'tofu')
+        self.assertEqual(models.normalize_name('Straße'), 'strasse')
+
+    def test_tag_normalized_name_kept_in_step(self):
+        tag = models.Tag.objects.create(user=create_user(), name='Vegan')
+        tag.name = ' VEGETARIAN'
+        tag.save(update_fields=['name'])
+
+        tag.refresh_from_db()
+        self.assertEqual(tag.normalized_name, 'vegetarian')
@@ -0,0 +1,266 @@
+'''Query count guard for every recipe and user API route
+
+Each route is requested against a small and a large data set. The number
+of queries must not grow with the data and must stay within the budget
+stored in benchmarks/query_budgets.json. After an intended change run
+
+    UPDATE_QUERY_BUDGETS=1 python manage.py test core.tests.test_query_budgets
+
+and commit the regenerated report.
+'''
+from decimal import Decimal
+import io
+import json
+import os
+import tempfile
+
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe import urls as recipe_urls
+from user import urls as user_urls
+
+
+BUDGETS_FILE = os.path.join(
+    settings.BASE_DIR, 'benchmarks', 'query_budgets.json',
+)
+SMALL = 2
+LARGE = 6
+METHODS = ['get', 'post', 'put', 'patch', 'delete']
+PASSWORD = 'testpass123'
+
+
+def iter_patterns(patterns):
+    for pattern in patterns:
+        if hasattr(pattern, 'url_patterns'):
+            yield from iter_patterns(pattern.url_patterns)
+        else:
+            yield pattern
+
+
+def registered_routes():
+    '''Return {(url name, method)} for every route of the apps'''
+    routes = set()
+    for module in (recipe_urls, user_urls):
+        for pattern in iter_patterns(module.urlpatterns):
+            callback = pattern.callback
+            actions = getattr(callback, 'actions', None)
+            if actions:
+                methods = [method for method in actions if method in METHODS]
+            else:
+                methods = [
+                    method for method in METHODS
+                    if hasattr(callback.view_class, method)
+                ]
+            for method in methods:
+                routes.add((f'{module.app_name}:{pattern.name}', method))
+
+    return routes
+
+
+def image_file():
+    content = io.BytesIO()
+    Image.new('RGB', (10, 10)).save(content, format='JPEG')
+    content.seek(0)
+    content.name = 'budget.jpg'
+    return content
+
+
+def merge_payload(model, user):
+    '''Merge all but the first of the user's rows into the first'''
+    ids = list(
+        model.objects.filter(user=user).order_by('id')
+        .values_list('id', flat=True)
+    )
+    return {'target': ids[0], 'sources': ids[1:]}
+
+
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        self.media_dir = tempfile.TemporaryDirectory()
+        self.media = override_settings(MEDIA_ROOT=self.media_dir.name)
+        self.media.enable()
+
+    def tearDown(self):
+        self.media.disable()
+        self.media_dir.cleanup()
+
+    def _create_data(self, size, index):
+        '''User with size recipes, each linked to size tags/ingredients'''
+        user = get_user_model().objects.create_user(
+            email=f'user-{size}-{index}@example.com',
+            password=PASSWORD,
+        )
+        tags = [
+            Tag.objects.create(user=user, name=f'Tag {i}')
+            for i in range(size)
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=user, name=f'Ingredient {i}')
+            for i in range(size)
+        ]
+        recipes = []
+        for i in range(size):
+            recipe = Recipe.objects.create(
+                user=user,
+                title=f'Recipe {i}',
+                time_mins=10,
+                price=Decimal('5.50'),
+                image=f'uploads/recipe/{i}.jpg',
+            )
+            recipe.tags.set(tags)
+            recipe.ingredients.set(ingredients)
+            recipes.append(recipe)
+
+        return user, recipes[0], tags[0], ingredients[0]
+
+    def _cases(self, user, recipe, tag, ingredient):
+        '''Return {(url name, method): (url, data, format)}'''
+        recipe_payload = {
+            'title': 'New recipe',
+            'time_mins': 20,
+            'price': '7.25',
+            'tags': [{'name': 'Tag 0'}, {'name': 'New tag'}],
+            'ingredients': [{'name': 'New ingredient'}],
+        }
+        recipe_list = reverse('recipe:recipe-list')
+        recipe_detail = reverse('recipe:recipe-detail', args=[recipe.id])
+        tag_detail = reverse('recipe:tag-detail', args=[tag.id])
+        ingredient_detail = reverse(
+            'recipe:ingredient-detail', args=[ingredient.id],
+        )
+        recipe_ids = Recipe.objects.filter(
+            user=user,
+        ).values_list('id', flat=True)
+        user_payload = {
+            'email': user.email,
+            'password': 'newpass123',
+            'name': 'Updated',
+        }
+
+        return {
+            ('recipe:api-root', 'get'): (reverse('recipe:api-root'), None),
+            ('recipe:recipe-list', 'get'): (recipe_list, None),
+            ('recipe:recipe-list', 'post'): (recipe_list, recipe_payload),
+            ('recipe:recipe-batch', 'get'): (
+                reverse('recipe:recipe-batch'),
+                {'ids': ','.join(str(id) for id in recipe_ids)},
+            ),
+            ('recipe:recipe-facets', 'get'): (
+                reverse('recipe:recipe-facets'), {'max_price': '10'},
+            ),
+            ('recipe:recipe-detail', 'get'): (recipe_detail, None),
+            ('recipe:recipe-detail', 'put'): (recipe_detail, recipe_payload),
+            ('recipe:recipe-detail', 'patch'): (
+                recipe_detail, {'title': 'Renamed'},
+            ),
+            ('recipe:recipe-detail', 'delete'): (recipe_detail, None),
+            ('recipe:recipe-image', 'get'): (
+                reverse('recipe:recipe-image', args=[recipe.id]),
+                None,
+            ),
+            ('recipe:recipe-upload-image', 'post'): (
+                reverse('recipe:recipe-upload-image', args=[recipe.id]),
+                {'image': image_file()},
+            ),
+            ('recipe:tag-list', 'get'): (reverse('recipe:tag-list'), None),
+            ('recipe:tag-merge', 'post'): (
+                reverse('recipe:tag-merge'),
+                merge_payload(Tag, user),
+            ),
+            ('recipe:tag-detail', 'put'): (tag_detail, {'name': 'Renamed'}),
+            ('recipe:tag-detail', 'patch'): (tag_detail, {'name': 'Renamed'}),
+            ('recipe:tag-detail', 'delete'): (tag_detail, None),
+            ('recipe:ingredient-list', 'get'): (
+                reverse('recipe:ingredient-list'), None,
+            ),
+            ('recipe:ingredient-merge', 'post'): (
+                reverse('recipe:ingredient-merge'),
+                merge_payload(Ingredient, user),
+            ),
+            ('recipe:ingredient-detail', 'put'): (
+                ingredient_detail, {'name': 'Renamed'},
+            ),
+            ('recipe:ingredient-detail', 'patch'): (
+                ingredient_detail, {'name': 'Renamed'},
+            ),
+            ('recipe:ingredient-detail', 'delete'): (ingredient_detail, None),
+            ('user:create', 'post'): (
+                reverse('user:create'),
+                {
+                    'email': f'new-{user.email}',
+                    'password': PASSWORD,
+                    'name': 'New',
+                },
+            ),
+            ('user:token', 'post'): (
+                reverse('user:token'),
+                {'email': user.email, 'password': PASSWORD},
+            ),
+            ('user:me', 'get'): (reverse('user:me'), None),
+            ('user:me', 'put'): (reverse('user:me'), user_payload),
+            ('user:me', 'patch'): (reverse('user:me'), {'name': 'Updated'}),
+            ('user:me', 'delete'): (reverse('user:me'), None),
+            ('user:me-stats', 'get'): (reverse('user:me-stats'), None),
+        }
+
+    def _count_queries(self, route, size, index):
+        user, recipe, tag, ingredient = self._create_data(size, index)
+        client = APIClient()
+        token = Token.objects.create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        url, data = self._cases(user, recipe, tag, ingredient)[route]
+        name, method = route
+        request_format = (
+            'multipart' if route == ('recipe:recipe-upload-image', 'post')
+            else 'json'
+        )
+
+        with CaptureQueriesContext(connection) as captured:
+            response = getattr(client, method)(
+                url, data, format=request_format,
+            )
+
+        self.assertLess(response.status_code, 400, route)
+        return len(captured)
+
+    def test_routes_have_cases(self):
+        user, recipe, tag, ingredient = self._create_data(1, 0)
+        cases = self._cases(user, recipe, tag, ingredient)
+
+        self.assertEqual(registered_routes(), set(cases))
+
+    def test_query_counts_constant_and_within_budget(self):
+        with open(BUDGETS_FILE) as f:
+            budgets = json.load(f)
+
+        report = {}
+        for index, route in enumerate(sorted(registered_routes())):
+            key = ' '.join((route[0], route[1].upper()))
+            with self.subTest(route=key):
+                small = self._count_queries(route, SMALL, index)
+                large = self._count_queries(route, LARGE, index)
+                report[key] = large
+
+                self.assertEqual(
+                    small, large,
+                    f'{key} queries grow with data: {small} -> {large}',
+                )
+                if not os.environ.get('UPDATE_QUERY_BUDGETS'):
+                    self.assertIn(key, budgets, f'{key} has no budget')
+                    self.assertLessEqual(large, budgets[key])
+
+        if os.environ.get('UPDATE_QUERY_BUDGETS'):
+            with open(BUDGETS_FILE, 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+                f.write('\n')
@@ -0,0 +1,90 @@
+'''Tests for the readiness check'''
+import tempfile
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import health
+
+
+READY_URL = reverse('ready')
+
+
+class ReadinessEndpointTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.media_dir = tempfile.TemporaryDirectory()
+        health._probe = None
+
+    def tearDown(self):
+        self.media_dir.cleanup()
+        health._probe = None
+
+    def test_ready(self):
+        with override_settings(MEDIA_ROOT=self.media_dir.name):
+            response = self.client.get(READY_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {
+            'ready': True,
+            'checks': {'database': 'ok', 'migrations': 'ok', 'media': 'ok'},
+        })
+
+    def test_media_not_writable(self):
+        missing = f'{self.media_dir.name}/missing'
+        with override_settings(MEDIA_ROOT=missing), \
+                self.assertLogs('core.health', 'ERROR'):
+            response = self.client.get(READY_URL)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+        data = response.json()
+        self.assertFalse(data['ready'])
+        self.assertEqual(data['checks']['media'], 'failed')
+        self.assertNotIn(missing, response.content.decode())
+
+    @patch('core.health.has_pending_migrations', return_value=True)
+    def test_pending_migrations(self, patched_pending):
+        with override_settings(MEDIA_ROOT=self.media_dir.name):
+            response = self.client.get(READY_URL)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+        self.assertEqual(response.json()['checks']['migrations'], 'failed')
+
+
+@patch('core.health.threading.Thread')
+@patch('core.health.run_checks', return_value={'ready': True, 'checks': {}})
+class ReadinessProbeTests(SimpleTestCase):
+    def test_result_cached(self, patched_checks, patched_thread):
+        probe = health.ReadinessProbe(ttl=60)
+
+        probe.get()
+        probe.get()
+
+        patched_checks.assert_called_once()
+        patched_thread.assert_not_called()
+
+    def test_stale_result_refreshed_in_background(
+        self,
+        patched_checks,
+        patched_thread,
+    ):
+        probe = health.ReadinessProbe(ttl=0)
+
+        result = probe.get()
+        self.assertEqual(probe.get(), result)
+        probe.get()
+
+        patched_checks.assert_called_once()
+        # only one refresh runs at a time
+        patched_thread.assert_called_once()
+        patched_thread.return_value.start.assert_called_once()
@@ -0,0 +1,135 @@
+'''Tests for the fixed window throttles'''
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+
+from core.throttling import (
+    AuthRateThrottle,
+    IPRateThrottle,
+    UserRateThrottle,
+)
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TOKEN_URL = reverse('user:token')
+
+
+def override_rate(throttle, rate):
+    return patch.object(throttle, 'THROTTLE_RATES', {throttle.scope: rate})
+
+
+class ThrottleTests(TestCase):
+    def setUp(self):
+        caches['throttle'].clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+
+    def tearDown(self):
+        caches['throttle'].clear()
+
+    def test_user_throttled(self):
+        self.client.force_authenticate(self.user)
+        with override_rate(UserRateThrottle, '2/min'):
+            for i in range(2):
+                response = self.client.get(RECIPES_URL)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            response = self.client.get(RECIPES_URL)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+        self.assertIn('Retry-After', response)
+
+    def test_users_counted_separately(self):
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        with override_rate(UserRateThrottle, '1/min'):
+            self.client.force_authenticate(self.user)
+            self.client.get(RECIPES_URL)
+            self.client.force_authenticate(other)
+            response = self.client.get(RECIPES_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_ip_throttled_across_users(self):
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        with override_rate(IPRateThrottle, '1/min'):
+            self.client.force_authenticate(self.user)
+            self.client.get(RECIPES_URL)
+            self.client.force_authenticate(other)
+            response = self.client.get(RECIPES_URL)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+
+    def test_token_throttled(self):
+        payload = {'email': 'user@example.com', 'password': 'testpass123'}
+        with override_rate(AuthRateThrottle, '1/min'):
+            response = self.client.post(TOKEN_URL, payload)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            response = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+
+    @patch.object(api_settings, 'NUM_PROXIES', 1)
+    def test_clients_behind_proxy_counted_separately(self):
+        payload = {'email': 'user@example.com', 'password': 'testpass123'}
+        # nginx appends the client address, earlier entries are the
+        # client's own and must not matter
+        with override_rate(AuthRateThrottle, '1/min'):
+            self.client.post(
+                TOKEN_URL, payload, HTTP_X_FORWARDED_FOR='1.1.1.1, 2.2.2.2',
+            )
+            response = self.client.post(
+                TOKEN_URL, payload, HTTP_X_FORWARDED_FOR='3.3.3.3',
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            response = self.client.post(
+                TOKEN_URL, payload, HTTP_X_FORWARDED_FOR='9.9.9.9, 2.2.2.2',
+            )
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+
+    @patch('core.throttling.FixedWindowRateThrottle.timer')
+    def test_counter_resets_next_window(self, patched_timer):
+        self.client.force_authenticate(self.user)
+        with override_rate(UserRateThrottle, '1/min'):
+            patched_timer.return_value = 60.0
+            self.client.get(RECIPES_URL)
+            response = self.client.get(RECIPES_URL)
+            self.assertEqual(
+                response.status_code,
+                status.HTTP_429_TOO_MANY_REQUESTS,
+            )
+
+            patched_timer.return_value = 120.0
+            response = self.client.get(RECIPES_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -0,0 +1,74 @@
+"""
+Fixed window request throttles backed by the "throttle" cache.
+
+DRF's built-in throttles keep a list of request timestamps per client and
+rewrite the whole list on every request. These keep one counter per
+client and window, so a check is a single cache add or increment and
+never touches the database.
+"""
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class FixedWindowRateThrottle(SimpleRateThrottle):
+    cache_alias = 'throttle'
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        now = self.timer()
+        window = int(now // self.duration)
+        key = f'{self.key}:{window}'
+        if self.cache.add(key, 1, self.duration):
+            count = 1
+        else:
+            try:
+                count = self.cache.incr(key)
+            except ValueError:
+                # expired between add and incr
+                self.cache.add(key, 1, self.duration)
+                count = 1
+
+        self.wait_seconds = (window + 1) * self.duration - now
+        return count <= self.num_requests
+
+    def wait(self):
+        return max(self.wait_seconds, 0)
+
+
+class UserRateThrottle(FixedWindowRateThrottle):
+    '''Limit each authenticated user, or anonymous IP'''
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class IPRateThrottle(FixedWindowRateThrottle):
+    '''Limit each client IP regardless of the user'''
+    scope = 'ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request),
+        }
+
+
+class AuthRateThrottle(IPRateThrottle):
+    '''Stricter per IP limit for signup and login'''
+    scope = 'auth'
@@ -1,7 +1,39 @@
-from rest_framework.decorators import api_view
-from rest_framework.response import Response
+import hmac
 
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
-@api_view(['GET'])
-def health_check(request):
-    return Response({'healthy': True})
+from core.health import get_probe
+from core.metrics import get_registry
+
+
+async def health_check(request):
+    # liveness only, see readiness_check for dependencies
+    # native async so liveness probes are never queued behind sync views
+    return JsonResponse({'healthy': True})
+
+
+def readiness_check(request):
+    """Ready to serve traffic: database, migrations and media volume"""
+    result = get_probe().get()
+    return JsonResponse(result, status=200 if result['ready'] else 503)
+
+
+def metrics(request):
+    """Prometheus metrics aggregated across all workers"""
+    token = settings.METRICS_TOKEN
+    if not token:
+        # only left open for local development
+        if not settings.DEBUG:
+            raise Http404
+    elif not hmac.compare_digest(
+        request.headers.get('Authorization', '').encode(),
+        f'Bearer {token}'.encode(),
+    ):
+        return HttpResponse(status=401)
+
+    return HttpResponse(
+        generate_latest(get_registry()),
+        content_type=CONTENT_TYPE_LATEST,
+    )
@@ -0,0 +1,124 @@
+"""
+Facet counts for the recipe filtering UI.
+
+Counts are computed with three grouped queries, whatever the number of
+recipes: one per tag, one per ingredient and one conditional aggregate
+for the time and price histograms. Results are cached per user and
+filter under a version key that is bumped whenever one of the user's
+recipes, tags or ingredients changes (see recipe.signals), so stale
+entries are never read and simply expire.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Max, Min, Q
+
+from core.metrics import record_cache
+from core.models import Tag, Ingredient
+
+
+# histogram bucket edges, the last bucket is open ended
+TIME_BUCKETS = [0, 15, 30, 60, 120]
+PRICE_BUCKETS = [0, 5, 10, 20, 50]
+
+
+def _cache():
+    return caches['recipes']
+
+
+def _version_key(user_id):
+    return f'recipe-facets-version:{user_id}'
+
+
+def get_version(user_id):
+    # add is a no-op when another request already set the version
+    _cache().add(_version_key(user_id), uuid.uuid4().hex, None)
+    return _cache().get(_version_key(user_id))
+
+
+def bump_version(user_id):
+    '''Invalidate every cached facet result of the user'''
+    # a fresh random version, a reset counter could match old entries
+    _cache().set(_version_key(user_id), uuid.uuid4().hex, None)
+
+
+def _buckets(field, edges):
+    buckets = {}
+    for i, low in enumerate(edges):
+        high = edges[i + 1] if i + 1 < len(edges) else None
+        condition = Q(**{f'{field}__gte': low})
+        if high is not None:
+            condition &= Q(**{f'{field}__lt': high})
+        buckets[f'{field}_{i}'] = Count('id', filter=condition)
+
+    return buckets
+
+
+def _histogram(field, edges, totals):
+    return [
+        {
+            'min': low,
+            'max': edges[i + 1] if i + 1 < len(edges) else None,
+            'count': totals[f'{field}_{i}'],
+        }
+        for i, low in enumerate(edges)
+    ]
+
+
+def _counts(model, recipes):
+    return list(
+        model.objects.filter(
+            recipe__in=recipes,
+        ).values('id', 'name').annotate(
+            count=Count('recipe'),
+        ).order_by('-count', 'name')
+    )
+
+
+def compute_facets(recipes):
+    '''Facet counts for a queryset of recipes'''
+    # a subquery keeps joins of the filters from counting recipes twice
+    recipes = recipes.model.objects.filter(
+        id__in=recipes.order_by().values('id'),
+    )
+    totals = recipes.aggregate(
+        total=Count('id'),
+        min_price=Min('price'),
+        max_price=Max('price'),
+        min_time=Min('time_mins'),
+        max_time=Max('time_mins'),
+        **_buckets('time_mins', TIME_BUCKETS),
+        **_buckets('price', PRICE_BUCKETS),
+    )
+
+    return {
+        'total': totals['total'],
+        'tags': _counts(Tag, recipes),
+        'ingredients': _counts(Ingredient, recipes),
+        'time_mins': _histogram('time_mins', TIME_BUCKETS, totals),
+        'price': _histogram('price', PRICE_BUCKETS, totals),
+        'range': {
+            'price': [
+                None if price is None else f'{price:.2f}'
+                for price in (totals['min_price'], totals['max_price'])
+            ],
+            'time_mins': [totals['min_time'], totals['max_time']],
+        },
+    }
+
+
+def get_facets(user, params, recipes):
+    '''Cached facets of recipes, the user's recipes filtered by params'''
+    filters = hashlib.md5(
+        repr(sorted(params.lists())).encode(), usedforsecurity=False,
+    ).hexdigest()
+    key = f'recipe-facets:{user.pk}:{get_version(user.pk)}:{filters}'
+    facets = _cache().get(key)
+    record_cache('recipe-facets', facets is not None)
+    if facets is None:
+        facets = compute_facets(recipes)
+        _cache().set(key, facets, settings.RECIPE_FACETS_CACHE_SECONDS)
+
+    return facets
@@ -1,10 +1,47 @@
+import os
+
+from django.db import models, transaction
+from django.db.models import F
 from rest_framework import serializers
-from core.models import Recipe
+from rest_framework.reverse import reverse
+
+from core.exceptions import PreconditionFailed
+from core.models import (
+    NORMALIZED_NAME_MAX_LENGTH,
+    Recipe,
+    normalize_name,
+)
 from core.models import Tag
 from core.models import Ingredient
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class UniqueNameMixin:
+    '''Reject renaming to a name the user already has'''
+
+    def validate_name(self, value):
+        normalized_name = normalize_name(value)
+        if len(normalized_name) > NORMALIZED_NAME_MAX_LENGTH:
+            raise serializers.ValidationError(
+                'This name is too long once normalized.'
+            )
+        # nested in a recipe, an existing name links the existing row
+        if self.parent is not None:
+            return value
+        queryset = self.Meta.model.objects.filter(
+            user=self.context['request'].user,
+            normalized_name=normalized_name,
+        )
+        if self.instance is not None:
+            queryset = queryset.exclude(pk=self.instance.pk)
+        if queryset.exists():
+            raise serializers.ValidationError(
+                'An entry with this name already exists, merge instead.'
+            )
+
+        return value
+
+
+class IngredientSerializer(UniqueNameMixin, serializers.ModelSerializer):
     """Ingredient Serializer"""
 
     class Meta:
@@ -13,7 +50,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(UniqueNameMixin, serializers.ModelSerializer):
     """Tag Serializer"""
 
     class Meta:
@@ -26,34 +63,46 @@ class RecipeSerializer(serializers.ModelSerializer):
     """Recipe Serializer"""
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
+    # on update, the version the client last read
+    version = serializers.IntegerField(required=False, min_value=1)
 
     class Meta:
         model = Recipe
         fields = [
             'id', 'title', 'time_mins', 'price', 'link', 'tags',
-            'ingredients',
+            'ingredients', 'version',
             ]
         read_only_fields = ['id']
 
     def _get_or_create_tags(self, tags, recipe):
         auth_user = self.context['request'].user
+        tag_objs = []
         for tag in tags:
+            # matched on the indexed normalized name, the unique
+            # constraint makes a concurrent create return the same row
             tag_obj, created = Tag.objects.get_or_create(
                 user=auth_user,
-                **tag,
+                normalized_name=normalize_name(tag['name']),
+                defaults=tag,
             )
-            recipe.tags.add(tag_obj)
+            tag_objs.append(tag_obj)
+        # one add() so the link signals fire once, not per tag
+        recipe.tags.add(*tag_objs)
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         auth_user = self.context['request'].user
+        ingredient_objs = []
         for ingredient in ingredients:
             ingredient_obj, create = Ingredient.objects.get_or_create(
                 user=auth_user,
-                **ingredient,
+                normalized_name=normalize_name(ingredient['name']),
+                defaults=ingredient,
             )
-            recipe.ingredients.add(ingredient_obj)
+            ingredient_objs.append(ingredient_obj)
+        recipe.ingredients.add(*ingredient_objs)
 
     def create(self, validated_data):
+        validated_data.pop('version', None)
         tags = validated_data.pop('tags', [])
         ingredients = validated_data.pop('ingredients', [])
         recipe = Recipe.objects.create(**validated_data)
@@ -63,23 +112,67 @@ class RecipeSerializer(serializers.ModelSerializer):
         return recipe
 
     def update(self, instance, validated_data):
+        expected = validated_data.pop('version', instance.version)
+        if expected != instance.version:
+            # the row changed since it was loaded, saving the loaded
+            # copy would undo that change
+            raise PreconditionFailed()
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
-        if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
-        if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
-
-        for attr, val in validated_data.items():
-            setattr(instance, attr, val)
-        instance.save()
+        with transaction.atomic():
+            # claim the next version with a conditional write instead of
+            # locking the row up front, the loser of a race gets a 412
+            claimed = Recipe.objects.filter(
+                pk=instance.pk,
+                version=expected,
+            ).update(version=F('version') + 1)
+            if not claimed:
+                raise PreconditionFailed()
+            instance.version = expected + 1
+
+            if tags is not None:
+                instance.tags.clear()
+                self._get_or_create_tags(tags, instance)
+            if ingredients is not None:
+                instance.ingredients.clear()
+                self._get_or_create_ingredients(ingredients, instance)
+
+            for attr, val in validated_data.items():
+                setattr(instance, attr, val)
+            # version too, so the save always runs and fires its signals
+            instance.save(update_fields=[*validated_data, 'version'])
         return instance
 
 
+class RecipeImageField(serializers.ImageField):
+    '''Image link to the recipe image endpoint, media is not public
+
+    The file name is part of the link so clients can cache the image for
+    long and still see a new upload.
+    '''
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        url = reverse(
+            'recipe:recipe-image',
+            args=[value.instance.pk],
+            request=self.context.get('request'),
+        )
+        version = os.path.splitext(os.path.basename(value.name))[0]
+
+        return f'{url}?v={version}'
+
+
+IMAGE_FIELD_MAPPING = {
+    **serializers.ModelSerializer.serializer_field_mapping,
+    models.ImageField: RecipeImageField,
+}
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     """Recipe Detail View Serializer"""
+    serializer_field_mapping = IMAGE_FIELD_MAPPING
 
     class Meta(RecipeSerializer.Meta):
         fields = RecipeSerializer.Meta.fields + ['description', 'image']
@@ -87,6 +180,7 @@ class RecipeDetailSerializer(RecipeSerializer):
 
 class RecipeImageSerializer(serializers.ModelSerializer):
     '''Serializer for uploading images to recipes'''
+    serializer_field_mapping = IMAGE_FIELD_MAPPING
 
     class Meta:
         model = Recipe
@@ -95,3 +189,48 @@ class RecipeImageSerializer(serializers.ModelSerializer):
         extra_kwargs = {
             'image': {'required': True}
         }
+
+    def update(self, instance, validated_data):
+        instance.image = validated_data['image']
+        # store the file, then write only the image column with a new
+        # version, a full save could undo another writer's edit
+        Recipe._meta.get_field('image').pre_save(instance, False)
+        Recipe.objects.filter(pk=instance.pk).update(
+            image=instance.image.name,
+            version=F('version') + 1,
+        )
+
+        return instance
+
+
+class MergeSerializer(serializers.Serializer):
+    '''Merge source tags or ingredients into a target'''
+    target = serializers.IntegerField()
+    sources = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=100,
+    )
+    # optionally rename the target in the same request
+    name = serializers.CharField(max_length=255, required=False)
+
+    def validate(self, attrs):
+        queryset = self.context['queryset']
+        ids = {attrs['target'], *attrs['sources']}
+        found = set(
+            queryset.filter(pk__in=ids).values_list('pk', flat=True)
+        )
+        missing = sorted(ids - found)
+        if missing:
+            raise serializers.ValidationError(
+                {'sources': f'Not found: {missing}'}
+            )
+        name = attrs.get('name')
+        if name and queryset.filter(
+            normalized_name=normalize_name(name),
+        ).exclude(pk__in=ids).exists():
+            raise serializers.ValidationError(
+                {'name': 'Another entry already has this name.'}
+            )
+
+        return attrs
@@ -0,0 +1,30 @@
+'''Invalidate cached recipe facets when a user's data changes
+
+Linking tags and ingredients to recipes changes the facet counts too, so
+m2m_changed is watched as well. user.signals listens to it already, so
+Django's fast path for add() is off either way.
+'''
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.facets import bump_version
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def recipe_data_changed(sender, instance, **kwargs):
+    bump_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_links_changed(sender, instance, action, **kwargs):
+    # instance is the recipe, or the tag or ingredient when reversed,
+    # both belong to the user whose facets change
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_version(instance.user_id)
@@ -0,0 +1,125 @@
+'''Tests for the recipe facets API'''
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+FACETS_URL = reverse('recipe:recipe-facets')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_recipe(user, **params):
+    defaults = {
+        'title': 'Sample recipe',
+        'time_mins': 10,
+        'price': Decimal('4.50'),
+    }
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def bucket_counts(histogram):
+    return [bucket['count'] for bucket in histogram]
+
+
+class FacetsAPITests(TestCase):
+    def setUp(self):
+        caches['recipes'].clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+        self.quick = Tag.objects.create(user=self.user, name='Quick')
+        self.rice = Ingredient.objects.create(user=self.user, name='Rice')
+        r1 = create_recipe(self.user, time_mins=10, price=Decimal('4.50'))
+        r1.tags.add(self.vegan, self.quick)
+        r1.ingredients.add(self.rice)
+        r2 = create_recipe(self.user, time_mins=45, price=Decimal('12.00'))
+        r2.tags.add(self.vegan)
+        create_recipe(self.user, time_mins=200, price=Decimal('60.00'))
+
+    def test_facet_counts(self):
+        response = self.client.get(FACETS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(
+            [(tag['name'], tag['count']) for tag in response.data['tags']],
+            [('Vegan', 2), ('Quick', 1)],
+        )
+        self.assertEqual(response.data['ingredients'][0]['count'], 1)
+        self.assertEqual(
+            bucket_counts(response.data['time_mins']), [1, 0, 1, 0, 1],
+        )
+        self.assertEqual(
+            bucket_counts(response.data['price']), [1, 0, 1, 0, 1],
+        )
+        self.assertEqual(response.data['range']['price'], ['4.50', '60.00'])
+
+    def test_facets_follow_filters(self):
+        params = {'tags': f'{self.vegan.id},{self.quick.id}', 'max_time': 60}
+
+        response = self.client.get(FACETS_URL, params)
+
+        self.assertEqual(response.data['total'], 2)
+        self.assertEqual(response.data['tags'][0]['count'], 2)
+
+    def test_other_users_excluded(self):
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        create_recipe(other)
+
+        response = self.client.get(FACETS_URL)
+
+        self.assertEqual(response.data['total'], 3)
+
+    def test_cached_until_data_changes(self):
+        self.client.get(FACETS_URL)
+
+        with self.assertNumQueries(0):
+            self.client.get(FACETS_URL)
+
+        payload = {'title': 'Soup', 'time_mins': 5, 'price': '2.50',
+                   'tags': [{'name': 'Quick'}]}
+        self.client.post(RECIPES_URL, payload, format='json')
+        response = self.client.get(FACETS_URL)
+
+        self.assertEqual(response.data['total'], 4)
+        self.assertEqual(
+            [tag['count'] for tag in response.data['tags']], [2, 2],
+        )
+
+    def test_linking_invalidates(self):
+        recipe = Recipe.objects.get(time_mins=200)
+        self.client.get(FACETS_URL)
+
+        recipe.tags.add(self.quick)
+        response = self.client.get(FACETS_URL)
+        self.assertEqual(
+            [tag['count'] for tag in response.data['tags']], [2, 2],
+        )
+
+        self.quick.recipe_set.clear()
+        response = self.client.get(FACETS_URL)
+        self.assertEqual(
+            [tag['count'] for tag in response.data['tags']], [2],
+        )
+
+    def test_invalid_range(self):
+        response = self.client.get(RECIPES_URL, {'min_price': 'cheap'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
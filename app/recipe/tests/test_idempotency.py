@@ -0,0 +1,217 @@
+'''Tests for Idempotency-Key handling on recipe creation and upload'''
+from datetime import timedelta
+from io import StringIO
+import tempfile
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import IdempotencyKey, Recipe
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+PAYLOAD = {'title': 'Soup', 'time_mins': 10, 'price': '4.00'}
+
+
+def image_upload_url(recipe_id):
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def post(self, payload, key='key-1'):
+        return self.client.post(
+            RECIPES_URL, payload, format='json',
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_replay_returns_stored_response(self):
+        first = self.post(PAYLOAD)
+        second = self.post(PAYLOAD)
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_without_key_not_stored(self):
+        self.client.post(RECIPES_URL, PAYLOAD, format='json')
+        self.client.post(RECIPES_URL, PAYLOAD, format='json')
+
+        self.assertEqual(Recipe.objects.count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_key_reused_for_other_request(self):
+        self.post(PAYLOAD)
+
+        response = self.post({**PAYLOAD, 'title': 'Stew'})
+
+        self.assertEqual(
+            response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_keys_scoped_to_user(self):
+        self.post(PAYLOAD)
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(other)
+
+        response = self.post(PAYLOAD)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_in_progress_conflict(self):
+        self.post(PAYLOAD)
+        # as if the first request were still running
+        IdempotencyKey.objects.update(status_code=None, response_body=None)
+
+        response = self.post(PAYLOAD)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    @override_settings(IDEMPOTENCY_LOCK_TIMEOUT=60)
+    def test_stale_in_progress_key_reclaimed(self):
+        self.post(PAYLOAD)
+        # the first request died before storing its response
+        IdempotencyKey.objects.update(
+            status_code=None,
+            response_body=None,
+            created_at=timezone.now() - timedelta(minutes=5),
+        )
+
+        response = self.post(PAYLOAD)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+    def test_claim_retried_when_blocking_key_deleted(self):
+        create = IdempotencyKey.objects.create
+        attempts = []
+
+        def lose_first_attempt(**kwargs):
+            # the key that made the insert fail is gone before it's read
+            attempts.append(kwargs)
+            if len(attempts) == 1:
+                raise IntegrityError
+            return create(**kwargs)
+
+        with patch.object(
+            IdempotencyKey.objects, 'create', side_effect=lose_first_attempt,
+        ):
+            response = self.post(PAYLOAD)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+    def test_claim_conflict_when_key_keeps_changing(self):
+        with patch.object(
+            IdempotencyKey.objects, 'create', side_effect=IntegrityError,
+        ):
+            response = self.post(PAYLOAD)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_invalid_request_not_stored(self):
+        response = self.post({'title': 'Soup'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class IdempotentUploadTests(TestCase):
+    def setUp(self):
+        self.media_dir = tempfile.TemporaryDirectory()
+        self.media = override_settings(MEDIA_ROOT=self.media_dir.name)
+        self.media.enable()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Pie', time_mins=5, price='3.00',
+        )
+
+    def tearDown(self):
+        self.media.disable()
+        self.media_dir.cleanup()
+
+    def upload(self, color):
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10), color).save(image_file, format='JPEG')
+            image_file.seek(0)
+            return self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': image_file},
+                format='multipart',
+                HTTP_IDEMPOTENCY_KEY='upload-1',
+            )
+
+    def test_upload_replayed(self):
+        first = self.upload('red')
+        self.recipe.refresh_from_db()
+        image = self.recipe.image.name
+
+        second = self.upload('red')
+
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, image)
+
+    def test_different_file_rejected(self):
+        self.upload('red')
+
+        response = self.upload('blue')
+
+        self.assertEqual(
+            response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+
+
+class PurgeIdempotencyKeysCommandTests(TestCase):
+    @override_settings(IDEMPOTENCY_KEY_TTL=3600)
+    def test_purge_expired_keys(self):
+        user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        now = timezone.now()
+        for i in range(5):
+            IdempotencyKey.objects.create(
+                user=user,
+                key=f'key-{i}',
+                fingerprint='',
+                created_at=now - timedelta(hours=2 if i < 3 else 0),
+            )
+
+        out = StringIO()
+        call_command('purge_idempotency_keys', batch_size=2, stdout=out)
+
+        self.assertEqual(IdempotencyKey.objects.count(), 2)
+        self.assertIn('Purged 3 expired', out.getvalue())
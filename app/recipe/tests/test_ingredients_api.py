@@ -14,6 +14,7 @@ from recipe.serializers import IngredientSerializer
 
 
 INGREDIENTS_URL = reverse('recipe:ingredient-list')
+MERGE_URL = reverse('recipe:ingredient-merge')
 
 
 def detail_url(ingredient_id):
@@ -124,3 +125,18 @@ class PrivateIngredientsAPITests(TestCase):
         response = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(response.data), 1)
+
+    def test_merge_ingredients(self):
+        target = Ingredient.objects.create(user=self.user, name='Salt')
+        source = Ingredient.objects.create(user=self.user, name='Sea salt')
+        recipe = Recipe.objects.create(
+            title='Chips', time_mins=5, price=Decimal('3.00'), user=self.user,
+        )
+        recipe.ingredients.add(source)
+
+        payload = {'target': target.id, 'sources': [source.id]}
+        response = self.client.post(MERGE_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Ingredient.objects.filter(id=source.id).exists())
+        self.assertEqual(list(recipe.ingredients.all()), [target])
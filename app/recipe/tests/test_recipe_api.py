@@ -5,12 +5,14 @@ import tempfile
 from PIL import Image
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from core.exceptions import PreconditionFailed
 from core.models import Recipe, Tag, Ingredient
 
 from recipe.serializers import (
@@ -20,6 +22,7 @@ from recipe.serializers import (
 
 
 RECIPES_URL = reverse('recipe:recipe-list')
+BATCH_URL = reverse('recipe:recipe-batch')
 
 
 def detail_url(recipe_id):
@@ -32,6 +35,10 @@ def image_upload_url(recipe_id):
     return reverse('recipe:recipe-upload-image', args=[recipe_id])
 
 
+def image_url(recipe_id):
+    return reverse('recipe:recipe-image', args=[recipe_id])
+
+
 def create_recipe(user, **params):
     defaults = {
         'title': 'Sample recipe',
@@ -405,6 +412,134 @@ class PrivateRecipeAPITests(TestCase):
         self.assertIn(serializer2.data, response.data)
         self.assertNotIn(serializer3.data, response.data)
 
+    def test_update_bumps_version_and_etag(self):
+        recipe = create_recipe(user=self.user)
+
+        response = self.client.get(detail_url(recipe.id))
+        self.assertEqual(response['ETag'], '"1"')
+
+        response = self.client.patch(
+            detail_url(recipe.id),
+            {'title': 'New'},
+            HTTP_IF_MATCH=response['ETag'],
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['version'], 2)
+        self.assertEqual(response['ETag'], '"2"')
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.version, 2)
+
+    def test_stale_if_match_rejected(self):
+        recipe = create_recipe(user=self.user, title='Old')
+        self.client.patch(detail_url(recipe.id), {'title': 'First'})
+
+        response = self.client.patch(
+            detail_url(recipe.id),
+            {'title': 'Second', 'tags': []},
+            format='json',
+            HTTP_IF_MATCH='"1"',
+        )
+
+        self.assertEqual(
+            response.status_code, status.HTTP_412_PRECONDITION_FAILED,
+        )
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'First')
+
+    def test_stale_version_field_rejected(self):
+        recipe = create_recipe(user=self.user, title='Old')
+        tag = Tag.objects.create(user=self.user, name='Kept')
+        recipe.tags.add(tag)
+        self.client.patch(detail_url(recipe.id), {'title': 'First'})
+
+        response = self.client.patch(
+            detail_url(recipe.id),
+            {'version': 1, 'tags': [{'name': 'Lost'}]},
+            format='json',
+        )
+
+        self.assertEqual(
+            response.status_code, status.HTTP_412_PRECONDITION_FAILED,
+        )
+        # the rejected update left the tags alone
+        self.assertEqual(list(recipe.tags.all()), [tag])
+
+    def test_update_of_changed_row_rejected(self):
+        recipe = create_recipe(user=self.user, title='Old')
+        # another writer commits after the recipe was loaded
+        Recipe.objects.filter(pk=recipe.pk).update(title='Other', version=2)
+        request = APIClient().get('/').wsgi_request
+        request.user = self.user
+        serializer = RecipeDetailSerializer(
+            recipe,
+            data={'version': 2, 'link': 'https://example.com'},
+            partial=True,
+            context={'request': request},
+        )
+        serializer.is_valid(raise_exception=True)
+
+        with self.assertRaises(PreconditionFailed):
+            serializer.save()
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Other')
+        self.assertEqual(recipe.version, 2)
+
+    def test_update_saves_only_changed_fields(self):
+        recipe = create_recipe(user=self.user, title='Old')
+
+        self.client.patch(detail_url(recipe.id), {'link': 'https://a.b'})
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.link, 'https://a.b')
+        self.assertEqual(recipe.title, 'Old')
+        self.assertEqual(recipe.version, 2)
+
+    def test_batch_preserves_order_and_reports_missing(self):
+        r1 = create_recipe(user=self.user, title='Thai Curry')
+        r2 = create_recipe(user=self.user, title='Pasta')
+        r2.tags.add(Tag.objects.create(user=self.user, name='Italian'))
+        other = create_recipe(
+            user=create_user(email='other@example.com', password='pw123456'),
+        )
+
+        params = {'ids': f'{r2.id},{other.id},{r1.id},{r2.id}'}
+        response = self.client.get(BATCH_URL, params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['results'],
+            RecipeDetailSerializer([r2, r1], many=True).data,
+        )
+        self.assertEqual(response.data['missing'], [other.id])
+
+    def test_batch_query_count_fixed(self):
+        recipes = [create_recipe(user=self.user) for i in range(5)]
+        tag = Tag.objects.create(user=self.user, name='Quick')
+        for recipe in recipes:
+            recipe.tags.add(tag)
+
+        params = {'ids': ','.join(str(r.id) for r in recipes)}
+        with self.assertNumQueries(3):
+            response = self.client.get(BATCH_URL, params)
+
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_batch_invalid_ids(self):
+        for ids in ['', '1,a']:
+            response = self.client.get(BATCH_URL, {'ids': ids})
+
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST,
+            )
+
+    @override_settings(RECIPE_BATCH_MAX_IDS=2)
+    def test_batch_limit(self):
+        response = self.client.get(BATCH_URL, {'ids': '1,2,3'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class ImageUploadTests(TestCase):
     '''Test image upload'''
@@ -433,6 +568,63 @@ class ImageUploadTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('image', response.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
+        # a new image is a change like any other
+        self.assertEqual(self.recipe.version, 2)
+        # links to the protected endpoint, versioned by file name
+        name = os.path.splitext(os.path.basename(self.recipe.image.name))[0]
+        self.assertTrue(response.data['image'].endswith(
+            f'{image_url(self.recipe.id)}?v={name}'
+        ))
+
+    def _set_image(self):
+        self.recipe.image.save(
+            'photo.jpg', SimpleUploadedFile('photo.jpg', b'jpeg bytes'),
+        )
+
+    def test_get_image_hands_off_to_nginx(self):
+        self._set_image()
+
+        response = self.client.get(
+            image_url(self.recipe.id), HTTP_ACCEPT='image/webp,image/*',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            f'/protected-media/{self.recipe.image.name}',
+        )
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response.content, b'')
+
+    @override_settings(DEBUG=True)
+    def test_get_image_debug_streams_file(self):
+        self._set_image()
+
+        response = self.client.get(image_url(self.recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('X-Accel-Redirect', response)
+        self.assertEqual(b''.join(response.streaming_content), b'jpeg bytes')
+
+    def test_get_image_other_users_recipe(self):
+        other = create_user(email='other@example.com', password='pass12345')
+        recipe = create_recipe(user=other)
+        recipe.image = 'uploads/recipe/photo.jpg'
+        recipe.save()
+
+        response = self.client.get(
+            image_url(recipe.id), HTTP_ACCEPT='image/*',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    def test_get_image_without_image(self):
+        response = self.client.get(image_url(self.recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_upload_image_bad_req(self):
         url = image_upload_url(self.recipe.id)
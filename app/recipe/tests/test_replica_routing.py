@@ -0,0 +1,51 @@
+'''Tests for replica routing of the recipe APIs'''
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+# route "replica" reads to the test database so queries still work
+@override_settings(REPLICA_DATABASES=['default'], REPLICA_STICKY_SECONDS=5)
+@patch('core.db.routers.random.choice', return_value='default')
+class ReplicaRoutingTests(TestCase):
+    def setUp(self):
+        caches['routing'].clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_safe_requests_use_replica(self, patched_choice):
+        response = self.client.get(RECIPES_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(patched_choice.called)
+
+        patched_choice.reset_mock()
+        self.client.get(TAGS_URL)
+        self.assertTrue(patched_choice.called)
+
+    def test_writes_use_primary_and_stick(self, patched_choice):
+        payload = {
+            'title': 'Sample recipe',
+            'time_mins': 5,
+            'price': Decimal('5.50'),
+        }
+        response = self.client.post(RECIPES_URL, payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(patched_choice.called)
+
+        self.client.get(RECIPES_URL)
+        self.assertFalse(patched_choice.called)
@@ -12,6 +12,7 @@ from recipe.serializers import TagSerializer
 
 
 TAGS_URL = reverse('recipe:tag-list')
+MERGE_URL = reverse('recipe:tag-merge')
 
 
 def create_user(email='user@example.com', password='Testpass123.'):
@@ -129,3 +130,100 @@ class PrivateTagApiTests(TestCase):
         response = self.client.get(TAGS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(response.data), 1)
+
+    def test_merge_tags(self):
+        '''Test merging duplicates relinks recipes to the target'''
+        target = Tag.objects.create(user=self.user, name='Tomato')
+        dup1 = Tag.objects.create(user=self.user, name='Tomatos')
+        dup2 = Tag.objects.create(user=self.user, name='Tomatoe')
+        both = Recipe.objects.create(
+            title='Salad', time_mins=5, price=Decimal('3.00'), user=self.user,
+        )
+        both.tags.add(target, dup1)
+        only_dup = Recipe.objects.create(
+            title='Soup', time_mins=5, price=Decimal('3.00'), user=self.user,
+        )
+        only_dup.tags.add(dup2)
+
+        payload = {
+            'target': target.id,
+            'sources': [dup1.id, dup2.id],
+            'name': 'Tomatoes',
+        }
+        response = self.client.post(MERGE_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['name'], 'Tomatoes')
+        self.assertEqual(list(Tag.objects.filter(user=self.user)), [target])
+        self.assertEqual(list(both.tags.all()), [target])
+        self.assertEqual(list(only_dup.tags.all()), [target])
+        target.refresh_from_db()
+        self.assertEqual(target.usage_count, 2)
+
+    def test_merge_other_users_tag_rejected(self):
+        '''Test tags of other users can't be merged'''
+        target = Tag.objects.create(user=self.user, name='Tomato')
+        other = Tag.objects.create(
+            user=create_user(email='other@example.com'),
+            name='tomato',
+        )
+
+        payload = {'target': target.id, 'sources': [other.id]}
+        response = self.client.post(MERGE_URL, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Tag.objects.filter(id=other.id).exists())
+
+    def test_tag_names_unique_when_normalized(self):
+        '''Test recipes reuse tags whose names differ in case/spacing'''
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        payload = {
+            'title': 'Salad',
+            'time_mins': 5,
+            'price': '3.00',
+            'tags': [{'name': ' VEGAN'}, {'name': 'vegan'}],
+        }
+
+        response = self.client.post(
+            reverse('recipe:recipe-list'), payload, format='json',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(list(Tag.objects.filter(user=self.user)), [tag])
+        self.assertEqual(response.data['tags'][0]['name'], 'Vegan')
+
+    def test_rename_to_existing_name_rejected(self):
+        '''Test renaming a tag onto another tag's name fails cleanly'''
+        Tag.objects.create(user=self.user, name='Dinner')
+        tag = Tag.objects.create(user=self.user, name='Lunch')
+
+        response = self.client.patch(detail_url(tag.id), {'name': 'DINNER'})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_name_growing_when_normalized(self):
+        '''Test names longer once normalized are stored or rejected'''
+        url = reverse('recipe:recipe-list')
+        payload = {'title': 'Soup', 'time_mins': 5, 'price': '3.00'}
+
+        # 255 characters that normalize to 510
+        response = self.client.post(
+            url, {**payload, 'tags': [{'name': 'ß' * 255}]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            Tag.objects.get(user=self.user).normalized_name, 'ss' * 255,
+        )
+
+        # 18 characters each once normalized, far too long
+        response = self.client.post(
+            url, {**payload, 'tags': [{'name': '\ufdfa' * 255}]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        tag = Tag.objects.get(user=self.user)
+        response = self.client.patch(
+            detail_url(tag.id), {'name': '\ufdfa' * 255},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -4,43 +4,129 @@ from drf_spectacular.utils import (
     OpenApiParameter,
     OpenApiTypes,
 )
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.http import Http404
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
 
+from core.authentication import ExpiringTokenAuthentication
+from core.db import routers
+from core.exceptions import PreconditionFailed
+from core.idempotency import idempotent
+from core import media
 from core.models import Recipe, Tag, Ingredient
 from recipe import serializers
+from recipe.facets import get_facets
+from recipe.merge import merge
+
+
+class ReplicaReadMixin:
+    '''Serve safe requests from a read replica
+
+    Users who just wrote are kept on the primary for
+    REPLICA_STICKY_SECONDS so they always read their own writes.
+    '''
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            request.method in SAFE_METHODS
+            and not routers.is_pinned_to_primary(request.user)
+        ):
+            self._replica_token = routers.use_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            routers.use_replica.reset(token)
+            self._replica_token = None
+        elif request.method not in SAFE_METHODS and response.status_code < 400:
+            routers.pin_to_primary(request.user)
+
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+FILTER_PARAMETERS = [
+    OpenApiParameter(
+        'tags',
+        OpenApiTypes.STR,
+        description='Comma Separated list of IDs to filter',
+    ),
+    OpenApiParameter(
+        'ingredients',
+        OpenApiTypes.STR,
+        description='Comma Separated list of IDs to filter',
+    ),
+] + [
+    OpenApiParameter(
+        name,
+        OpenApiTypes.NUMBER,
+        description=f'{bound} {field} to filter',
+    )
+    for name, bound, field in [
+        ('min_price', 'Minimum', 'price'),
+        ('max_price', 'Maximum', 'price'),
+        ('min_time', 'Minimum', 'time in minutes'),
+        ('max_time', 'Maximum', 'time in minutes'),
+    ]
+]
 
 
 @extend_schema_view(
     list=extend_schema(
+        parameters=FILTER_PARAMETERS,
+    ),
+    facets=extend_schema(
+        parameters=FILTER_PARAMETERS,
+    ),
+    batch=extend_schema(
         parameters=[
             OpenApiParameter(
-                'tags',
-                OpenApiTypes.STR,
-                description='Comma Separated list of IDs to filter',
-            ),
-            OpenApiParameter(
-                'ingredients',
+                'ids',
                 OpenApiTypes.STR,
-                description='Comma Separated list of IDs to filter',
+                required=True,
+                description='Comma Separated list of recipe IDs to fetch',
             )
         ]
-    )
+    ),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """"view for manage recipe APIs"""
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [ExpiringTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def _params_to_ints(self, qs):
         return [int(str_id) for str_id in qs.split(',')]
 
-    def get_queryset(self):
+    def _range_filters(self):
+        '''Return lookups for the min/max price and time parameters'''
+        lookups = {}
+        ranges = [
+            ('min_price', 'price__gte', Decimal),
+            ('max_price', 'price__lte', Decimal),
+            ('min_time', 'time_mins__gte', int),
+            ('max_time', 'time_mins__lte', int),
+        ]
+        for param, lookup, convert in ranges:
+            value = self.request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                lookups[lookup] = convert(value)
+            except (ValueError, InvalidOperation):
+                raise ValidationError({param: 'Must be a number.'})
+
+        return lookups
+
+    def _filtered_queryset(self):
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
         queryset = self.queryset
@@ -52,7 +138,14 @@ class RecipeViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(ingredients__id__in=ingredient_ids)
 
         return queryset.filter(
-            user=self.request.user
+            user=self.request.user,
+            **self._range_filters(),
+        )
+
+    def get_queryset(self):
+        return self._filtered_queryset().prefetch_related(
+            'tags',
+            'ingredients',
         ).order_by('-id').distinct()
 
     def get_serializer_class(self):
@@ -63,10 +156,104 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         return self.serializer_class
 
+    def _if_match_version(self, recipe):
+        '''Version the If-Match header expects, None when not sent'''
+        header = self.request.headers.get('If-Match')
+        if not header or header.strip() == '*':
+            return None
+        etags = [
+            etag.strip().removeprefix('W/').strip('"')
+            for etag in header.split(',')
+        ]
+        if str(recipe.version) not in etags:
+            raise PreconditionFailed()
+
+        return recipe.version
+
+    def perform_update(self, serializer):
+        version = self._if_match_version(serializer.instance)
+        if version is None:
+            serializer.save()
+        else:
+            serializer.save(version=version)
+
+    def perform_content_negotiation(self, request, force=False):
+        # images are fetched with Accept: image/*, errors still get JSON
+        return super().perform_content_negotiation(
+            request, force=force or self.action == 'image',
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs,
+        )
+        if (
+            self.action in ('create', 'retrieve', 'update', 'partial_update')
+            and isinstance(response.data, dict)
+            and 'version' in response.data
+        ):
+            response['ETag'] = f'"{response.data["version"]}"'
+
+        return response
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(methods=['GET'], detail=False, url_path='facets')
+    def facets(self, request):
+        '''Counts per tag, ingredient, time and price for the filters'''
+        return Response(get_facets(
+            request.user,
+            request.query_params,
+            self._filtered_queryset(),
+        ))
+
+    @action(methods=['GET'], detail=False, url_path='batch')
+    def batch(self, request):
+        '''Return recipe details for a list of ids in the requested order'''
+        try:
+            ids = self._params_to_ints(request.query_params.get('ids', ''))
+        except ValueError:
+            raise ValidationError(
+                {'ids': 'Must be a comma separated list of IDs.'}
+            )
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > settings.RECIPE_BATCH_MAX_IDS:
+            raise ValidationError(
+                {'ids': f'At most {settings.RECIPE_BATCH_MAX_IDS} IDs.'}
+            )
+
+        recipes = Recipe.objects.filter(
+            user=request.user,
+            id__in=ids,
+        ).prefetch_related('tags', 'ingredients').in_bulk()
+        found = [recipes[id] for id in ids if id in recipes]
+        serializer = self.get_serializer(found, many=True)
+
+        return Response({
+            'results': serializer.data,
+            'missing': [id for id in ids if id not in recipes],
+        })
+
+    @extend_schema(responses={(200, 'image/*'): OpenApiTypes.BINARY})
+    @action(methods=['GET'], detail=True, url_path='image')
+    def image(self, request, pk=None):
+        '''The recipe image, sent by nginx once access is checked'''
+        recipe = get_object_or_404(
+            self.queryset.filter(user=request.user).only('id', 'image'),
+            pk=pk,
+        )
+        if not recipe.image:
+            raise Http404
+
+        return media.serve(recipe.image)
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
+    @idempotent
     def upload_image(self, request, pk=None):
         recipe = self.get_object()
         serializer = self.get_serializer(
@@ -96,13 +283,35 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
 )
 class BassRecipeAttrViewSet(
+                 ReplicaReadMixin,
                  mixins.UpdateModelMixin,
                  mixins.DestroyModelMixin,
                  mixins.ListModelMixin,
                  viewsets.GenericViewSet):
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [ExpiringTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
+    @extend_schema(request=serializers.MergeSerializer)
+    @action(methods=['POST'], detail=False, url_path='merge')
+    def merge(self, request):
+        '''Fold duplicates into one, relinking their recipes'''
+        queryset = self.queryset.filter(user=request.user)
+        serializer = serializers.MergeSerializer(
+            data=request.data,
+            context={'queryset': queryset},
+        )
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        target = queryset.get(pk=data['target'])
+        merge(self.queryset.model, target, data['sources'])
+        name = data.get('name')
+        if name:
+            target.name = name
+            target.save(update_fields=['name'])
+        target.refresh_from_db()
+
+        return Response(self.get_serializer(target).data)
+
     def get_queryset(self):
         assigned_only = bool(
             int(self.request.query_params.get('assigned_only', 0))
@@ -0,0 +1,134 @@
+"""
+Deleting user accounts without one huge cascade.
+
+Deleting a user through the ORM cascades to all their recipes, tags,
+ingredients and links in one transaction, loading every row into memory
+to run the delete signals. request_deletion() only deactivates the
+account. The process_user_deletions command later calls delete_user()
+for each requested account, which removes the data in batches with plain
+DELETE statements, each in its own short transaction, deleting the image
+files of each batch of recipes just before their rows.
+
+The raw deletes skip signals on purpose: the stats and facet cache they
+would update belong to the account being deleted.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+
+from rest_framework.authtoken.models import Token
+
+from core.models import (
+    Recipe,
+    Tag,
+    Ingredient,
+    IdempotencyKey,
+)
+
+
+def request_deletion(user):
+    '''Deactivate user and queue their account for deletion'''
+    user.is_active = False
+    user.deletion_requested_at = timezone.now()
+    user.save(update_fields=['is_active', 'deletion_requested_at'])
+    # log the account out everywhere straight away
+    Token.objects.filter(user=user).delete()
+
+
+def pending():
+    '''Users waiting for their data to be deleted, oldest request first'''
+    return get_user_model().objects.filter(
+        deletion_requested_at__isnull=False,
+    ).order_by('deletion_requested_at', 'pk')
+
+
+def _delete(model, field, values):
+    '''DELETE the rows of model whose field is in values, no signals'''
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    column = quote(model._meta.get_field(field).column)
+    placeholders = ', '.join(['%s'] * len(values))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {column} IN ({placeholders})',
+            list(values),
+        )
+        return cursor.rowcount
+
+
+def _batches(queryset, batch_size, *fields):
+    '''Yield lists of the first rows of queryset until none are left
+
+    Each batch is deleted before the next one is read, so there is no
+    need for an offset.
+    '''
+    queryset = queryset.order_by('pk').values_list('pk', *fields)
+    while True:
+        batch = list(queryset[:batch_size])
+        if not batch:
+            return
+        yield batch
+
+
+def _delete_recipes(user_id, batch_size):
+    field = Recipe._meta.get_field('image')
+    for batch in _batches(
+        Recipe.objects.filter(user_id=user_id), batch_size, 'image',
+    ):
+        ids = [pk for pk, image in batch]
+        # files first: if the run dies before the rows are deleted, the
+        # next run still finds the rows and retries them. Deleted rows
+        # first would leave files nothing refers to any more.
+        for pk, image in batch:
+            if image:
+                field.storage.delete(image)
+        with transaction.atomic():
+            _delete(Recipe.tags.through, 'recipe', ids)
+            _delete(Recipe.ingredients.through, 'recipe', ids)
+            _delete(Recipe, 'id', ids)
+        yield len(ids)
+
+
+def _delete_linked(model, through, user_id, batch_size):
+    for batch in _batches(model.objects.filter(user_id=user_id), batch_size):
+        ids = [pk for pk, in batch]
+        with transaction.atomic():
+            _delete(through, model._meta.model_name, ids)
+            _delete(model, 'id', ids)
+        yield len(ids)
+
+
+def _delete_owned(model, user_id, batch_size):
+    for batch in _batches(model.objects.filter(user_id=user_id), batch_size):
+        yield _delete(model, model._meta.pk.name, [pk for pk, in batch])
+
+
+def delete_user(user, batch_size=500):
+    '''Delete user and all their data a batch at a time
+
+    Yields (what, running count) after every batch for progress reports.
+    Safe to run again after an interruption, it carries on with what is
+    left.
+    '''
+    steps = [
+        ('recipes', _delete_recipes(user.pk, batch_size)),
+        ('tags', _delete_linked(
+            Tag, Recipe.tags.through, user.pk, batch_size,
+        )),
+        ('ingredients', _delete_linked(
+            Ingredient, Recipe.ingredients.through, user.pk, batch_size,
+        )),
+        ('idempotency keys', _delete_owned(
+            IdempotencyKey, user.pk, batch_size,
+        )),
+        ('tokens', _delete_owned(Token, user.pk, batch_size)),
+    ]
+    for what, batches in steps:
+        done = 0
+        for count in batches:
+            done += count
+            yield what, done
+
+    # what is left is a handful of rows, the ORM cascade is cheap now
+    user.delete()
+    yield 'account', 1
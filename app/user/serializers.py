@@ -6,6 +6,8 @@ from django.utils.translation import gettext as _
 
 from rest_framework import serializers
 
+from core.models import UserStats
+
 
 class UserSerializer(serializers.ModelSerializer):
 
@@ -49,3 +51,29 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class UsageSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    usage_count = serializers.IntegerField()
+
+
+class UserStatsSerializer(serializers.ModelSerializer):
+    '''Summary of the user's recipes'''
+    average_price = serializers.DecimalField(
+        max_digits=14, decimal_places=2, allow_null=True, read_only=True,
+    )
+    average_time_mins = serializers.FloatField(
+        allow_null=True, read_only=True,
+    )
+    top_tags = UsageSerializer(many=True, read_only=True)
+    top_ingredients = UsageSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = UserStats
+        fields = [
+            'recipe_count', 'average_price', 'average_time_mins',
+            'top_tags', 'top_ingredients',
+        ]
+        read_only_fields = fields
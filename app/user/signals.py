@@ -0,0 +1,79 @@
+'''Keep user.stats running totals in step with recipe changes'''
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.db.models import F
+from django.dispatch import receiver
+
+from core.models import Recipe, User, UserStats
+from user import stats
+
+
+def _snapshot(recipe):
+    return {field: getattr(recipe, field) for field in Recipe.STATS_FIELDS}
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    # start every user with a row so stats are only ever updated in place
+    if created and not raw:
+        UserStats.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    new = _snapshot(instance)
+    old = getattr(instance, '_loaded_stats', {})
+    if created:
+        stats.apply(new['user_id'], 1, new['price'], new['time_mins'])
+    elif set(old) != set(Recipe.STATS_FIELDS):
+        # saved without being loaded, the old values are unknown
+        stats.rebuild([new['user_id']])
+    elif old['user_id'] != new['user_id']:
+        stats.apply(old['user_id'], -1, -old['price'], -old['time_mins'])
+        stats.apply(new['user_id'], 1, new['price'], new['time_mins'])
+    elif old != new:
+        stats.apply(
+            new['user_id'],
+            0,
+            new['price'] - old['price'],
+            new['time_mins'] - old['time_mins'],
+        )
+    instance._loaded_stats = new
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleting(sender, instance, **kwargs):
+    # the links are deleted with the recipe, count them down first
+    stats.change_usage(instance, -1)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    old = getattr(instance, '_loaded_stats', None) or _snapshot(instance)
+    stats.apply(old['user_id'], -1, -old['price'], -old['time_mins'])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_links_changed(sender, instance, action, reverse, model, pk_set,
+                         **kwargs):
+    if reverse:
+        # a tag or ingredient was linked to recipes, recount just it
+        if action.startswith('post_'):
+            stats.refresh_usage(type(instance), pk=instance.pk)
+        return
+
+    # counted by difference: links are checked before they are removed
+    # and pk_set holds only new links after an add
+    if action == 'pre_clear':
+        stats.change_usage(instance, -1, [model])
+    elif action == 'pre_remove' and pk_set:
+        stats.change_usage(instance, -1, [model], pk__in=pk_set)
+    elif action == 'post_add' and pk_set:
+        model.objects.filter(pk__in=pk_set).update(
+            usage_count=F('usage_count') + 1,
+        )
@@ -0,0 +1,115 @@
+"""
+Per-user recipe statistics kept as running totals.
+
+UserStats holds the recipe count and the price and time totals of each
+user, and Tag/Ingredient.usage_count the number of recipes linked to each.
+They are updated by difference as recipes change (see user.signals) so
+reading a user's stats never scans their recipes. rebuild() recomputes
+them from scratch, for backfills and after bulk changes that skip
+signals.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from core.models import Recipe, Tag, Ingredient, UserStats
+
+
+def _through(model):
+    if model is Tag:
+        return Recipe.tags.through
+    return Recipe.ingredients.through
+
+
+def refresh_usage(model, **filters):
+    '''Recount usage_count of the tags or ingredients matching filters'''
+    column = model._meta.model_name
+    counts = _through(model).objects.filter(
+        **{column: OuterRef('pk')},
+    ).values(column).annotate(count=Count('*')).values('count')
+    model.objects.filter(**filters).update(
+        usage_count=Coalesce(Subquery(counts), 0),
+    )
+
+
+def change_usage(recipe, delta, models=(Tag, Ingredient), **filters):
+    '''Add delta to usage_count of what is linked to recipe'''
+    for model in models:
+        model.objects.filter(recipe=recipe, **filters).update(
+            usage_count=F('usage_count') + delta,
+        )
+
+
+def apply(user_id, count, price, time_mins):
+    '''Add the differences to the user's totals
+
+    Users get their row when created. One without a row (created by a
+    bulk insert) is skipped, get_stats() rebuilds it on the next read.
+    '''
+    UserStats.objects.filter(user_id=user_id).update(
+        recipe_count=F('recipe_count') + count,
+        total_price=F('total_price') + price,
+        total_time_mins=F('total_time_mins') + time_mins,
+    )
+
+
+def rebuild(user_ids, batch_size=1000):
+    '''Recompute stats and usage counts of the given users'''
+    totals = {
+        row.pop('user'): row
+        for row in Recipe.objects.filter(
+            user__in=user_ids,
+        ).values('user').annotate(
+            recipe_count=Count('id'),
+            total_price=Sum('price'),
+            total_time_mins=Sum('time_mins'),
+        ).order_by()
+    }
+    with transaction.atomic():
+        UserStats.objects.filter(user__in=user_ids).delete()
+        UserStats.objects.bulk_create(
+            [
+                UserStats(user_id=user_id, **totals.get(user_id, {}))
+                for user_id in user_ids
+            ],
+            batch_size=batch_size,
+        )
+        refresh_usage(Tag, user__in=user_ids)
+        refresh_usage(Ingredient, user__in=user_ids)
+
+
+def rebuild_all(batch_size=1000):
+    '''Rebuild every user's stats, yielding the running user count'''
+    user_ids = get_user_model().objects.order_by('pk').values_list(
+        'pk', flat=True,
+    )
+    done = 0
+    last = None
+    while True:
+        batch = user_ids if last is None else user_ids.filter(pk__gt=last)
+        batch = list(batch[:batch_size])
+        if not batch:
+            break
+        rebuild(batch, batch_size)
+        done += len(batch)
+        last = batch[-1]
+        yield done
+
+
+def get_stats(user, top=5):
+    '''Return the user's UserStats with their most used tags/ingredients'''
+    stats = UserStats.objects.filter(user=user).first()
+    if stats is None:
+        rebuild([user.pk])
+        stats = UserStats.objects.get(user=user)
+
+    for name, model in (('top_tags', Tag), ('top_ingredients', Ingredient)):
+        setattr(stats, name, list(
+            model.objects.filter(
+                user=user,
+                usage_count__gt=0,
+            ).order_by('-usage_count', 'name')[:top]
+        ))
+
+    return stats
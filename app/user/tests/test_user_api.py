@@ -74,6 +74,7 @@ class PublicUserAPITests(TestCase):
         response = self.client.post(TOKEN_URL, payload)
 
         self.assertIn('token', response.data)
+        self.assertIn('expires_in', response.data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
     def test_create_token_invalid_credentials(self):
@@ -0,0 +1,165 @@
+'''Tests for deleting user accounts'''
+from decimal import Decimal
+from io import StringIO
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient, IdempotencyKey, UserStats
+from user import deletion
+
+
+ME_URL = reverse('user:me')
+TOKEN_URL = reverse('user:token')
+
+
+def create_user(email='user@example.com', password='testpass123'):
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_recipes(user, count):
+    tags = [Tag.objects.create(user=user, name=f'Tag {i}') for i in range(3)]
+    ingredient = Ingredient.objects.create(user=user, name='Salt')
+    recipes = []
+    for i in range(count):
+        recipe = Recipe.objects.create(
+            user=user,
+            title=f'Recipe {i}',
+            time_mins=10,
+            price=Decimal('5.00'),
+        )
+        recipe.tags.add(*tags)
+        recipe.ingredients.add(ingredient)
+        recipes.append(recipe)
+
+    return recipes
+
+
+class RequestDeletionApiTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_delete_deactivates_and_keeps_data(self):
+        create_recipes(self.user, 2)
+
+        response = self.client.delete(ME_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertIsNotNone(self.user.deletion_requested_at)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        # the data goes later, in batches
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+    def test_deleted_account_is_locked_out(self):
+        self.client.delete(ME_URL)
+
+        response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = APIClient().post(TOKEN_URL, {
+            'email': self.user.email,
+            'password': 'testpass123',
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class DeleteUserTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.user = create_user()
+        self.other = create_user('other@example.com')
+
+    def test_delete_user_in_batches(self):
+        recipes = create_recipes(self.user, 5)
+        recipes[0].image.save(
+            'photo.jpg', SimpleUploadedFile('photo.jpg', b'image'),
+        )
+        path = recipes[0].image.path
+        Token.objects.create(user=self.user)
+        IdempotencyKey.objects.create(
+            user=self.user,
+            key='abc',
+            fingerprint='x',
+            created_at=timezone.now(),
+        )
+        kept = create_recipes(self.other, 1)[0]
+        deletion.request_deletion(self.user)
+
+        progress = list(deletion.delete_user(self.user, batch_size=2))
+
+        self.assertEqual(progress, [
+            ('recipes', 2),
+            ('recipes', 4),
+            ('recipes', 5),
+            ('tags', 2),
+            ('tags', 3),
+            ('ingredients', 1),
+            ('idempotency keys', 1),
+            ('account', 1),
+        ])
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists()
+        )
+        self.assertFalse(os.path.exists(path))
+        for model in (Recipe, Tag, Ingredient, IdempotencyKey, UserStats):
+            self.assertFalse(model.objects.filter(user=self.user).exists())
+        # only the other user's links are left
+        self.assertEqual(Recipe.tags.through.objects.count(), 3)
+        self.assertEqual(Recipe.ingredients.through.objects.count(), 1)
+        self.assertEqual(kept.tags.count(), 3)
+
+    def test_interrupted_run_leaves_no_files(self):
+        recipes = create_recipes(self.user, 2)
+        for recipe in recipes:
+            recipe.image.save(
+                'photo.jpg', SimpleUploadedFile('photo.jpg', b'image'),
+            )
+        deletion.request_deletion(self.user)
+
+        # the process dies while removing the files of the first batch
+        storage = Recipe._meta.get_field('image').storage
+        with patch.object(storage, 'delete', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                list(deletion.delete_user(self.user, batch_size=2))
+        list(deletion.delete_user(self.user, batch_size=2))
+
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+        uploads = os.path.join(self.media_root, 'uploads', 'recipe')
+        self.assertEqual(os.listdir(uploads), [])
+
+    def test_process_user_deletions(self):
+        create_recipes(self.user, 3)
+        create_recipes(self.other, 1)
+        deletion.request_deletion(self.user)
+        out = StringIO()
+
+        call_command('process_user_deletions', '--batch-size=2', stdout=out)
+
+        self.assertIn('deleted 3 recipes', out.getvalue())
+        self.assertIn('Deleted 1 accounts', out.getvalue())
+        self.assertFalse(
+            get_user_model().objects.filter(pk=self.user.pk).exists()
+        )
+        self.assertEqual(Recipe.objects.filter(user=self.other).count(), 1)
+        self.assertFalse(deletion.pending().exists())
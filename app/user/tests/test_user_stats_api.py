@@ -0,0 +1,121 @@
+'''Tests for the user statistics API'''
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient, UserStats
+
+
+STATS_URL = reverse('user:me-stats')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def recipe_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class PublicUserStatsTests(TestCase):
+    def test_auth_required(self):
+        response = APIClient().get(STATS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateUserStatsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, **params):
+        payload = {'title': 'Soup', 'time_mins': 10, 'price': '4.00'}
+        payload.update(params)
+        response = self.client.post(RECIPES_URL, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        return response.data['id']
+
+    def assert_matches_rebuild(self):
+        '''The running totals equal the ones computed from scratch'''
+        response = self.client.get(STATS_URL)
+        call_command('rebuild_user_stats', stdout=StringIO())
+        rebuilt = self.client.get(STATS_URL)
+
+        self.assertEqual(response.data, rebuilt.data)
+        return response.data
+
+    def test_empty_stats(self):
+        response = self.client.get(STATS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['recipe_count'], 0)
+        self.assertIsNone(response.data['average_price'])
+        self.assertEqual(response.data['top_tags'], [])
+
+    def test_stats_follow_recipe_changes(self):
+        first = self.create_recipe(
+            tags=[{'name': 'Vegan'}, {'name': 'Quick'}],
+            ingredients=[{'name': 'Rice'}],
+        )
+        self.create_recipe(
+            time_mins=20, price='8.00', tags=[{'name': 'Vegan'}],
+        )
+
+        data = self.assert_matches_rebuild()
+        self.assertEqual(data['recipe_count'], 2)
+        self.assertEqual(data['average_price'], '6.00')
+        self.assertEqual(data['average_time_mins'], 15.0)
+        self.assertEqual(
+            [(tag['name'], tag['usage_count']) for tag in data['top_tags']],
+            [('Vegan', 2), ('Quick', 1)],
+        )
+
+        self.client.patch(
+            recipe_url(first),
+            {'price': '2.00', 'tags': [{'name': 'Quick'}]},
+            format='json',
+        )
+        data = self.assert_matches_rebuild()
+        self.assertEqual(data['average_price'], '5.00')
+        self.assertEqual(
+            [(tag['name'], tag['usage_count']) for tag in data['top_tags']],
+            [('Quick', 1), ('Vegan', 1)],
+        )
+
+        self.client.delete(recipe_url(first))
+        data = self.assert_matches_rebuild()
+        self.assertEqual(data['recipe_count'], 1)
+        self.assertEqual(data['top_ingredients'], [])
+
+    def test_reverse_links_counted(self):
+        recipe = Recipe.objects.create(
+            user=self.user, title='Pie', time_mins=5, price=Decimal('3.00'),
+        )
+        tag = Tag.objects.create(user=self.user, name='Baking')
+        tag.recipe_set.add(recipe)
+        ingredient = Ingredient.objects.create(user=self.user, name='Flour')
+        recipe.ingredients.add(ingredient)
+        recipe.ingredients.remove(ingredient)
+
+        tag.refresh_from_db()
+        ingredient.refresh_from_db()
+        self.assertEqual(tag.usage_count, 1)
+        self.assertEqual(ingredient.usage_count, 0)
+
+    def test_missing_stats_rebuilt_on_read(self):
+        self.create_recipe()
+        UserStats.objects.filter(user=self.user).delete()
+
+        response = self.client.get(STATS_URL)
+
+        self.assertEqual(response.data['recipe_count'], 1)
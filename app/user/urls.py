@@ -8,4 +8,5 @@ urlpatterns = [
     path('create/', views.CreateUserView.as_view(), name='create'),
     path('token/', views.CreateTokenView.as_view(), name='token'),
     path('me/', views.ManageUserView.as_view(), name='me'),
+    path('me/stats/', views.UserStatsView.as_view(), name='me-stats'),
 ]
@@ -1,26 +1,59 @@
-from rest_framework import generics, authentication, permissions
+from django.conf import settings
+from rest_framework import generics, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core.authentication import ExpiringTokenAuthentication, issue_token
+from core.throttling import AuthRateThrottle
+from user import deletion, stats
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
+    UserStatsSerializer,
     )
 
 
 class CreateUserView(generics.CreateAPIView):
     serializer_class = UserSerializer
+    throttle_classes = [AuthRateThrottle]
 
 
 class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = [AuthRateThrottle]
 
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token = issue_token(serializer.validated_data['user'])
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+        return Response({
+            'token': token.key,
+            'expires_in': settings.TOKEN_TTL,
+        })
+
+
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [ExpiringTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         return self.request.user
+
+    def destroy(self, request, *args, **kwargs):
+        # the account is closed now, process_user_deletions removes the data
+        deletion.request_deletion(self.get_object())
+
+        return Response(status=status.HTTP_202_ACCEPTED)
+
+
+class UserStatsView(generics.RetrieveAPIView):
+    serializer_class = UserStatsSerializer
+    authentication_classes = [ExpiringTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_object(self):
+        return stats.get_stats(self.request.user, settings.USER_STATS_TOP)
@@ -0,0 +1,24 @@
+server {
+    listen ${LISTEN_PORT};
+
+    sendfile    on;
+    tcp_nopush  on;
+
+    location /static/static/ {
+        alias /vol/static/static/;
+    }
+
+    # uploaded media is not public, the app checks access and hands the
+    # file back with X-Accel-Redirect (see core.media); nginx serves ranges
+    # and passes the app's Cache-Control on
+    location /protected-media/ {
+        internal;
+        alias /vol/static/media/;
+    }
+
+    location / {
+        proxy_pass          http://${APP_HOST}:${APP_PORT};
+        include             /etc/nginx/proxy_params;
+        client_max_body_size 10M;
+    }
+}
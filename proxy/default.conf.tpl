@@ -1,8 +1,19 @@
 server {
     listen ${LISTEN_PORT};
 
-    location /static {
-        alias /vol/static;
+    sendfile    on;
+    tcp_nopush  on;
+
+    location /static/static/ {
+        alias /vol/static/static/;
+    }
+
+    # uploaded media is not public, the app checks access and hands the
+    # file back with X-Accel-Redirect (see core.media); nginx serves ranges
+    # and passes the app's Cache-Control on
+    location /protected-media/ {
+        internal;
+        alias /vol/static/media/;
     }
 
     location / {
@@ -2,5 +2,11 @@
 
 set -e
 
-envsubst < /etc/nginx/default.conf.tpl > /etc/nginx/conf.d/default.conf
-nginx -g 'daemon off;'
\ No newline at end of file
+if [ "${APP_SERVER:-wsgi}" = "asgi" ]; then
+    TEMPLATE=/etc/nginx/default-asgi.conf.tpl
+else
+    TEMPLATE=/etc/nginx/default.conf.tpl
+fi
+
+envsubst '${LISTEN_PORT} ${APP_HOST} ${APP_PORT}' < $TEMPLATE > /etc/nginx/conf.d/default.conf
+nginx -g 'daemon off;'
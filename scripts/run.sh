@@ -2,8 +2,84 @@
 
 set -e
 
+STATIC_ROOT=${STATIC_ROOT:-/vol/web/static}
+STARTUP_BEGIN=$(date +%s)
+
+log_phase() {
+    echo "startup: $1 done after $(($(date +%s) - STARTUP_BEGIN))s"
+}
+
+# static files are collected at build time, copy them to the shared
+# volume only when this image's manifest differs from what's there
+sync_static() {
+    if cmp -s /static-manifest "$STATIC_ROOT/.manifest"; then
+        log_phase "static files (up to date)"
+        return
+    fi
+    cp -r /static-build/. "$STATIC_ROOT/"
+    cp /static-manifest "$STATIC_ROOT/.manifest"
+    log_phase "static files (copied)"
+}
+
+sync_static &
+STATIC_PID=$!
+
 python manage.py wait_for_db
-python manage.py collectstatic --noinput
-python manage.py migrate
+log_phase "wait_for_db"
+python manage.py migrate_if_needed
+log_phase "migrations"
+
+wait $STATIC_PID
+
+# workers write metrics here, api/metrics/ aggregates them
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/vol/metrics}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+log_phase "ready to serve"
+
+# worker tuning, see "Server Tuning" in README.md
+WORKERS=${SERVER_WORKERS:-$(nproc)}
+THREADS=${SERVER_THREADS:-2}
+LISTEN_BACKLOG=${SERVER_LISTEN_BACKLOG:-100}
+BUFFER_SIZE=${SERVER_BUFFER_SIZE:-8192}
+TIMEOUT=${SERVER_TIMEOUT:-30}
+MAX_REQUESTS=${SERVER_MAX_REQUESTS:-5000}
+RELOAD_ON_RSS=${SERVER_RELOAD_ON_RSS:-256}
+LAZY_APPS=${SERVER_LAZY_APPS:-0}
+# proxies whose X-Forwarded-For uvicorn trusts for the client address
+FORWARDED_ALLOW_IPS=${SERVER_FORWARDED_ALLOW_IPS:-127.0.0.1}
+
+if [ "${APP_SERVER:-wsgi}" = "asgi" ]; then
+    # async views (health check) run on the event loop, sync DRF views
+    # run in each worker's thread pool
+    set -- \
+        --bind :9000 \
+        --workers "$WORKERS" \
+        --worker-class uvicorn.workers.UvicornWorker \
+        --backlog "$LISTEN_BACKLOG" \
+        --timeout "$TIMEOUT" \
+        --max-requests "$MAX_REQUESTS" \
+        --forwarded-allow-ips "$FORWARDED_ALLOW_IPS"
+    if [ "$LAZY_APPS" != "1" ]; then
+        set -- "$@" --preload
+    fi
+    exec gunicorn app.asgi:application "$@"
+fi
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
\ No newline at end of file
+set -- \
+    --socket :9000 \
+    --master \
+    --module app.wsgi \
+    --workers "$WORKERS" \
+    --threads "$THREADS" \
+    --enable-threads \
+    --listen "$LISTEN_BACKLOG" \
+    --buffer-size "$BUFFER_SIZE" \
+    --harakiri "$TIMEOUT" \
+    --max-requests "$MAX_REQUESTS" \
+    --reload-on-rss "$RELOAD_ON_RSS"
+# without --lazy-apps the master loads Django once before forking
+if [ "$LAZY_APPS" = "1" ]; then
+    set -- "$@" --lazy-apps
+fi
+exec uwsgi "$@"